@@ -0,0 +1,137 @@
+# bench_pdf.py
+# Rendering benchmark for InvoicePDFGenerator on synthetic invoices.
+# Headless: needs reportlab only, not PyQt5 or a database.
+#
+#   python bench_pdf.py -o before.json
+#   python bench_pdf.py -o after.json --compare before.json
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import reportlab
+
+from invoice_pdf import InvoicePDFGenerator, TEMPLATE_VERSION
+
+SIZES = [1, 10, 100, 1000]
+
+PRODUCT_WORDS = ["Câble", "Disjoncteur", "Prise", "Interrupteur", "Gaine", "Boîtier",
+                 "Tube", "Lampe", "Coffret", "Bornier", "électrique", "étanche", "murale",
+                 "encastrée", "double", "16A", "2.5mm²", "blanc", "gris", "renforcé"]
+
+
+def synthetic_invoice(items, unicode_customer=False, seed=0):
+    # Deterministic for a given seed, so runs are comparable
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(items):
+        quantity = rng.randint(1, 50)
+        price = round(rng.uniform(0.5, 500), 2)
+        name = " ".join(rng.choice(PRODUCT_WORDS) for _ in range(rng.randint(1, 8)))
+        rows.append({'name': name, 'quantity': quantity, 'price': price, 'total': quantity * price})
+    net_total = sum(row['total'] for row in rows)
+    if unicode_customer:
+        customer = {'name': "شركة النور للتجارة", 'address': "شارع الاستقلال، وهران", 'phone': "0550 12 34 56"}
+    else:
+        customer = {'name': "Société Générale de Distribution", 'address': "12 rue de l'Église, Oran",
+                    'phone': "0550 12 34 56"}
+    return {
+        'invoice_id': 1000 + items,
+        'type': "Facture",
+        'date': "2024-01-15 10:30:00",
+        'customer': customer,
+        'items': rows,
+        'net_total': net_total,
+        'discount': 5,
+        'total': net_total * 0.95,
+    }
+
+
+def bench_case(invoice_data, repeat):
+    generator = InvoicePDFGenerator(invoice_data)
+    generator.to_bytes()        # warm up: templates, fonts
+
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pdf = generator.to_bytes()
+        times.append(time.perf_counter() - started)
+
+    # Separate run: tracemalloc slows rendering down
+    tracemalloc.start()
+    generator.to_bytes()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'items': len(invoice_data['items']),
+        'min_ms': min(times) * 1000,
+        'median_ms': statistics.median(times) * 1000,
+        'peak_kb': peak / 1024,
+        'bytes': len(pdf),
+    }
+
+
+def run(sizes, repeat, unicode_customer=False):
+    return {
+        'created': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'reportlab': reportlab.Version,
+        'template_version': TEMPLATE_VERSION,
+        'unicode_customer': unicode_customer,
+        'repeat': repeat,
+        'results': [bench_case(synthetic_invoice(size, unicode_customer), repeat) for size in sizes],
+    }
+
+
+def print_report(report, baseline=None):
+    previous = {}
+    if baseline is not None:
+        previous = {result['items']: result for result in baseline['results']}
+    print(f"{'items':>6} {'median ms':>10} {'min ms':>8} {'peak KB':>9} {'bytes':>9}")
+    for result in report['results']:
+        line = (f"{result['items']:>6} {result['median_ms']:>10.2f} {result['min_ms']:>8.2f} "
+                f"{result['peak_kb']:>9.0f} {result['bytes']:>9}")
+        before = previous.get(result['items'])
+        if before:
+            line += (f"   time {change(before['median_ms'], result['median_ms'])}"
+                     f"  memory {change(before['peak_kb'], result['peak_kb'])}"
+                     f"  size {change(before['bytes'], result['bytes'])}")
+        print(line)
+
+
+def change(before, after):
+    if not before:
+        return "   n/a"
+    return f"{(after - before) / before * 100:+6.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark invoice PDF rendering")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="item counts to render")
+    parser.add_argument("--repeat", type=int, default=20, help="timed renders per size")
+    parser.add_argument("--unicode", action="store_true", help="Arabic customer, to exercise font embedding")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    report = run(args.sizes, args.repeat, args.unicode)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,84 +1,643 @@
+import re
 import sqlite3
+import threading
 from contextlib import contextmanager
 
+# PRAGMA profiles applied to every new connection.
+# "fast": WAL + synchronous=NORMAL, a commit is not fsynced until checkpoint,
+#         so the last transactions may be lost on power failure (never corrupted).
+# "safe": WAL + synchronous=FULL, every commit is fsynced.
+PROFILES = {
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -32000,       # KiB, ~32 MB page cache
+        "mmap_size": 268435456,     # 256 MB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+}
+
+# Trigger bodies keeping the dashboard summary tables (migration 7) in step
+# with invoices and their lines: `row` is "new" or "old". Rows whose count
+# drops to zero are removed so the tables only hold what is still there.
+# Released migrations embed these, so change them only by adding new
+# functions for a new step.
+def _add_period_type_summaries(row):
+    return f"""
+        INSERT INTO daily_revenue (day, invoice_count, revenue)
+        VALUES (substr({row}.date, 1, 10), 1, {row}.total)
+        ON CONFLICT (day) DO UPDATE SET invoice_count = invoice_count + 1,
+                                        revenue = revenue + excluded.revenue;
+        INSERT INTO type_summary (type, invoice_count, revenue)
+        VALUES ({row}.type, 1, {row}.total)
+        ON CONFLICT (type) DO UPDATE SET invoice_count = invoice_count + 1,
+                                         revenue = revenue + excluded.revenue;
+    """
+
+def _remove_period_type_summaries(row):
+    return f"""
+        UPDATE daily_revenue SET invoice_count = invoice_count - 1, revenue = revenue - {row}.total
+        WHERE day = substr({row}.date, 1, 10);
+        DELETE FROM daily_revenue WHERE day = substr({row}.date, 1, 10) AND invoice_count <= 0;
+        UPDATE type_summary SET invoice_count = invoice_count - 1, revenue = revenue - {row}.total
+        WHERE type = {row}.type;
+        DELETE FROM type_summary WHERE type = {row}.type AND invoice_count <= 0;
+    """
+
+def _add_customer_stats(row):
+    return f"""
+        INSERT INTO customer_stats (customer_id, invoice_count, revenue)
+        SELECT {row}.customer_id, 1, {row}.total WHERE {row}.customer_id IS NOT NULL
+        ON CONFLICT (customer_id) DO UPDATE SET invoice_count = invoice_count + 1,
+                                                revenue = revenue + excluded.revenue;
+    """
+
+def _remove_customer_stats(row):
+    return f"""
+        UPDATE customer_stats SET invoice_count = invoice_count - 1, revenue = revenue - {row}.total
+        WHERE customer_id = {row}.customer_id;
+        DELETE FROM customer_stats WHERE customer_id = {row}.customer_id AND invoice_count <= 0;
+    """
+
+def _add_invoice_summaries(row):
+    return _add_period_type_summaries(row) + _add_customer_stats(row)
+
+def _remove_invoice_summaries(row):
+    return _remove_period_type_summaries(row) + _remove_customer_stats(row)
+
+# Customer rollups with the last invoice date (migration 8). The invoice
+# being removed is already gone (AFTER DELETE) or changed (AFTER UPDATE), so
+# the last date is looked up again, on idx_invoices_customer_date, only
+# when the removed invoice was the customer's latest.
+def _add_customer_rollup(row):
+    return f"""
+        INSERT INTO customer_stats (customer_id, invoice_count, revenue, last_invoice_date)
+        SELECT {row}.customer_id, 1, {row}.total, {row}.date WHERE {row}.customer_id IS NOT NULL
+        ON CONFLICT (customer_id) DO UPDATE SET
+            invoice_count = invoice_count + 1,
+            revenue = revenue + excluded.revenue,
+            last_invoice_date = max(coalesce(last_invoice_date, ''), excluded.last_invoice_date);
+    """
+
+def _remove_customer_rollup(row):
+    return f"""
+        UPDATE customer_stats SET invoice_count = invoice_count - 1, revenue = revenue - {row}.total
+        WHERE customer_id = {row}.customer_id;
+        DELETE FROM customer_stats WHERE customer_id = {row}.customer_id AND invoice_count <= 0;
+        UPDATE customer_stats SET last_invoice_date = (
+            SELECT MAX(date) FROM invoices WHERE customer_id = {row}.customer_id
+        )
+        WHERE customer_id = {row}.customer_id AND last_invoice_date <= {row}.date;
+    """
+
+def _add_item_sales(row):
+    return f"""
+        INSERT INTO product_sales (name, line_count, quantity, revenue)
+        SELECT {row}.name, 1, coalesce({row}.quantity, 0),
+               coalesce({row}.quantity, 0) * coalesce({row}.price, 0)
+        WHERE {row}.name IS NOT NULL
+        ON CONFLICT (name) DO UPDATE SET line_count = line_count + 1,
+                                         quantity = quantity + excluded.quantity,
+                                         revenue = revenue + excluded.revenue;
+    """
+
+def _remove_item_sales(row):
+    return f"""
+        UPDATE product_sales SET line_count = line_count - 1,
+                                 quantity = quantity - coalesce({row}.quantity, 0),
+                                 revenue = revenue - coalesce({row}.quantity, 0) * coalesce({row}.price, 0)
+        WHERE name = {row}.name;
+        DELETE FROM product_sales WHERE name = {row}.name AND line_count <= 0;
+    """
+
+# Schema migrations, applied in order. Step N brings the database to
+# PRAGMA user_version N. Never edit a released step, append a new one.
+MIGRATIONS = [
+    # 1: initial schema (IF NOT EXISTS so databases created before
+    #    versioning are adopted as-is)
+    (
+        """
+        CREATE TABLE IF NOT EXISTS owner (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            address TEXT NOT NULL,
+            phone TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            description TEXT,
+            price REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS customers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            address TEXT NOT NULL,
+            phone TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS invoices (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            owner_id INTEGER,
+            customer_id INTEGER,
+            date TEXT NOT NULL,
+            total REAL NOT NULL,
+            type TEXT NOT NULL DEFAULT 'Bon de commande',
+            FOREIGN KEY (owner_id) REFERENCES owner(id),
+            FOREIGN KEY (customer_id) REFERENCES customers(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS invoice_items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            invoice_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER,
+            price REAL,
+            FOREIGN KEY (invoice_id) REFERENCES invoices(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        )
+        """,
+    ),
+    # 2: secondary indexes for the customer/date/type lookups and for
+    #    fetching the lines of an invoice
+    (
+        "CREATE INDEX IF NOT EXISTS idx_invoices_customer_date ON invoices (customer_id, date)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices (date)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_type_date ON invoices (type, date, total, customer_id)",
+        "CREATE INDEX IF NOT EXISTS idx_invoice_items_invoice "
+        "ON invoice_items (invoice_id, id, product_id, quantity, price)",
+    ),
+    # 3: indexes backing the keyset-paginated orderings (see PAGE_ORDERINGS)
+    (
+        "CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)",
+        "CREATE INDEX IF NOT EXISTS idx_products_price ON products (price)",
+        "CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_total ON invoices (total)",
+    ),
+    # 4: full-text search. invoice_items gets the line text (product name as
+    #    typed on the invoice), and FTS5 indexes over products, customers and
+    #    invoice lines are kept in sync by triggers.
+    (
+        "ALTER TABLE invoice_items ADD COLUMN name TEXT",
+        """
+        CREATE VIRTUAL TABLE products_fts USING fts5(
+            name, description,
+            content='products', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE customers_fts USING fts5(
+            name, address, phone,
+            content='customers', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE invoice_items_fts USING fts5(
+            name,
+            content='invoice_items', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER products_fts_insert AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts (rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER products_fts_delete AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER products_fts_update AFTER UPDATE ON products BEGIN
+            INSERT INTO products_fts (products_fts, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO products_fts (rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER customers_fts_insert AFTER INSERT ON customers BEGIN
+            INSERT INTO customers_fts (rowid, name, address, phone)
+            VALUES (new.id, new.name, new.address, new.phone);
+        END
+        """,
+        """
+        CREATE TRIGGER customers_fts_delete AFTER DELETE ON customers BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, address, phone)
+            VALUES ('delete', old.id, old.name, old.address, old.phone);
+        END
+        """,
+        """
+        CREATE TRIGGER customers_fts_update AFTER UPDATE ON customers BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, address, phone)
+            VALUES ('delete', old.id, old.name, old.address, old.phone);
+            INSERT INTO customers_fts (rowid, name, address, phone)
+            VALUES (new.id, new.name, new.address, new.phone);
+        END
+        """,
+        """
+        CREATE TRIGGER invoice_items_fts_insert AFTER INSERT ON invoice_items BEGIN
+            INSERT INTO invoice_items_fts (rowid, name) VALUES (new.id, new.name);
+        END
+        """,
+        """
+        CREATE TRIGGER invoice_items_fts_delete AFTER DELETE ON invoice_items BEGIN
+            INSERT INTO invoice_items_fts (invoice_items_fts, rowid, name)
+            VALUES ('delete', old.id, old.name);
+        END
+        """,
+        """
+        CREATE TRIGGER invoice_items_fts_update AFTER UPDATE ON invoice_items BEGIN
+            INSERT INTO invoice_items_fts (invoice_items_fts, rowid, name)
+            VALUES ('delete', old.id, old.name);
+            INSERT INTO invoice_items_fts (rowid, name) VALUES (new.id, new.name);
+        END
+        """,
+        "INSERT INTO products_fts (products_fts) VALUES ('rebuild')",
+        "INSERT INTO customers_fts (customers_fts) VALUES ('rebuild')",
+        "INSERT INTO invoice_items_fts (invoice_items_fts) VALUES ('rebuild')",
+    ),
+    # 5: keep the discount so stored invoices can be re-rendered exactly
+    (
+        "ALTER TABLE invoices ADD COLUMN discount REAL NOT NULL DEFAULT 0",
+    ),
+    # 6: invoice history filtered by type and sorted by id / type / total
+    #    (see get_invoice_history)
+    (
+        "CREATE INDEX IF NOT EXISTS idx_invoices_type ON invoices (type)",
+        "CREATE INDEX IF NOT EXISTS idx_invoices_type_total ON invoices (type, total)",
+    ),
+    # 7: dashboard summary tables, maintained by triggers in the same
+    #    transaction as the invoice change, so the dashboard never has to
+    #    scan the invoice history. Revenue is the invoice total (after
+    #    discount) per day / type / customer, and quantity * price per
+    #    product name.
+    (
+        """
+        CREATE TABLE daily_revenue (
+            day TEXT PRIMARY KEY,
+            invoice_count INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE type_summary (
+            type TEXT PRIMARY KEY,
+            invoice_count INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE customer_stats (
+            customer_id INTEGER PRIMARY KEY,
+            invoice_count INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE product_sales (
+            name TEXT PRIMARY KEY,
+            line_count INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            revenue REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX idx_customer_stats_revenue ON customer_stats (revenue)",
+        "CREATE INDEX idx_product_sales_revenue ON product_sales (revenue)",
+        f"CREATE TRIGGER invoices_summary_insert AFTER INSERT ON invoices BEGIN {_add_invoice_summaries('new')} END",
+        f"CREATE TRIGGER invoices_summary_delete AFTER DELETE ON invoices BEGIN {_remove_invoice_summaries('old')} END",
+        f"""
+        CREATE TRIGGER invoices_summary_update AFTER UPDATE OF date, total, type, customer_id ON invoices BEGIN
+            {_remove_invoice_summaries('old')}
+            {_add_invoice_summaries('new')}
+        END
+        """,
+        f"CREATE TRIGGER invoice_items_sales_insert AFTER INSERT ON invoice_items BEGIN {_add_item_sales('new')} END",
+        f"CREATE TRIGGER invoice_items_sales_delete AFTER DELETE ON invoice_items BEGIN {_remove_item_sales('old')} END",
+        f"""
+        CREATE TRIGGER invoice_items_sales_update AFTER UPDATE OF name, quantity, price ON invoice_items BEGIN
+            {_remove_item_sales('old')}
+            {_add_item_sales('new')}
+        END
+        """,
+        # Existing invoices
+        """
+        INSERT INTO daily_revenue (day, invoice_count, revenue)
+        SELECT substr(date, 1, 10), COUNT(*), SUM(total) FROM invoices GROUP BY 1
+        """,
+        """
+        INSERT INTO type_summary (type, invoice_count, revenue)
+        SELECT type, COUNT(*), SUM(total) FROM invoices GROUP BY type
+        """,
+        """
+        INSERT INTO customer_stats (customer_id, invoice_count, revenue)
+        SELECT customer_id, COUNT(*), SUM(total) FROM invoices
+        WHERE customer_id IS NOT NULL GROUP BY customer_id
+        """,
+        """
+        INSERT INTO product_sales (name, line_count, quantity, revenue)
+        SELECT name, COUNT(*), SUM(coalesce(quantity, 0)), SUM(coalesce(quantity, 0) * coalesce(price, 0))
+        FROM invoice_items WHERE name IS NOT NULL GROUP BY name
+        """,
+    ),
+    # 8: last invoice date in the customer rollups, for the Customers page
+    (
+        "ALTER TABLE customer_stats ADD COLUMN last_invoice_date TEXT",
+        "DROP TRIGGER invoices_summary_insert",
+        "DROP TRIGGER invoices_summary_delete",
+        "DROP TRIGGER invoices_summary_update",
+        f"""
+        CREATE TRIGGER invoices_summary_insert AFTER INSERT ON invoices BEGIN
+            {_add_period_type_summaries('new')}
+            {_add_customer_rollup('new')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER invoices_summary_delete AFTER DELETE ON invoices BEGIN
+            {_remove_period_type_summaries('old')}
+            {_remove_customer_rollup('old')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER invoices_summary_update AFTER UPDATE OF date, total, type, customer_id ON invoices BEGIN
+            {_remove_period_type_summaries('old')}
+            {_remove_customer_rollup('old')}
+            {_add_period_type_summaries('new')}
+            {_add_customer_rollup('new')}
+        END
+        """,
+        """
+        UPDATE customer_stats SET last_invoice_date = (
+            SELECT MAX(date) FROM invoices WHERE invoices.customer_id = customer_stats.customer_id
+        )
+        """,
+    ),
+    # 9: merge the duplicate customers invoice saves used to create, one per
+    #    invoice, into the oldest row with the same details. Moving the
+    #    invoices updates customer_stats through the summary triggers.
+    (
+        """
+        CREATE TEMP TABLE customer_merge AS 
+        SELECT customers.id AS old_id, keep.id AS new_id 
+        FROM customers JOIN (
+            SELECT MIN(id) AS id, name, address, phone FROM customers 
+            GROUP BY name, address, phone HAVING COUNT(*) > 1
+        ) AS keep ON customers.name IS keep.name AND customers.address IS keep.address 
+                 AND customers.phone IS keep.phone 
+        WHERE customers.id != keep.id
+        """,
+        """
+        UPDATE invoices SET customer_id = (
+            SELECT new_id FROM customer_merge WHERE old_id = invoices.customer_id
+        )
+        WHERE customer_id IN (SELECT old_id FROM customer_merge)
+        """,
+        "DELETE FROM customers WHERE id IN (SELECT old_id FROM customer_merge)",
+        "DROP TABLE customer_merge",
+    ),
+]
+
+# Customer rows with their rollups, as shown on the Customers page
+CUSTOMER_ROLLUP_COLUMNS = """customers.id, customers.name, customers.address, customers.phone, 
+    coalesce(customer_stats.invoice_count, 0), coalesce(customer_stats.revenue, 0.0), 
+    date(customer_stats.last_invoice_date)"""
+
+# What the rollups must hold, computed from the invoices themselves
+CUSTOMER_ROLLUP_SOURCE = """
+    SELECT customer_id, COUNT(*) AS invoice_count, SUM(total) AS revenue, MAX(date) AS last_invoice_date
+    FROM invoices WHERE customer_id IS NOT NULL GROUP BY customer_id"""
+
+# Columns each table can be paged by. Every one of them is indexed, and ties
+# are broken by id so keyset pagination never skips or repeats a row.
+PAGE_ORDERINGS = {
+    "products": ("id", "name", "price"),
+    "customers": ("id", "name"),
+    "invoices": ("id", "date", "total"),
+}
+
+# Column order of SELECT * for the paged tables
+PAGE_COLUMNS = {
+    "products": ("id", "name", "description", "price"),
+    "customers": ("id", "name", "address", "phone"),
+    "invoices": ("id", "owner_id", "customer_id", "date", "total", "type", "discount"),
+}
+
+# Columns of the invoice history rows, in order, with the expression each
+# one sorts by (customer names are NULL for deleted customers)
+HISTORY_COLUMNS = {
+    "id": "invoices.id",
+    "date": "invoices.date",
+    "customer": "COALESCE(customers.name, '')",
+    "type": "invoices.type",
+    "total": "invoices.total",
+}
+
+def fts_query(text):
+    # Turn what the user typed into an FTS5 query: every word must match,
+    # as a prefix so results show up while the word is still being typed.
+    # Words are quoted so FTS5 operators in the input are taken literally.
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
 class Database:
-    def __init__(self, db_name="invoiciz.db"):
+    def __init__(self, db_name="invoiciz.db", persistent=True, per_thread=False, profile="fast"):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown database profile: {profile}")
         self.db_name = db_name
         self.conn = None
+        self.profile = profile
+        # persistent=False keeps the old behaviour (one connection per query).
+        # per_thread=True gives every thread its own long-lived connection,
+        # otherwise a single shared connection is guarded by a lock.
+        self.persistent = persistent
+        self.per_thread = per_thread
+        self._lock = threading.RLock()
+        # Separate from _lock, which a running query holds on the shared
+        # connection, so interrupt() can reach the connections meanwhile
+        self._registry_lock = threading.Lock()
+        self._local = threading.local()
+        self._connections = []
+
+    def _open(self, **kwargs):
+        conn = sqlite3.connect(self.db_name, **kwargs)
+        for pragma, value in PROFILES[self.profile].items():
+            conn.execute(f"PRAGMA {pragma} = {value}")
+        return conn
+
+    def _connect(self):
+        conn = self._open(check_same_thread=False)
+        with self._registry_lock:
+            self._connections.append(conn)
+        return conn
 
     @contextmanager
     def get_connection(self):
-        try:
-            self.conn = sqlite3.connect(self.db_name)
+        # Inside transaction() every query goes through the same connection
+        tx_conn = getattr(self._local, "tx_conn", None)
+        if tx_conn is not None:
+            yield tx_conn
+            return
+
+        if not self.persistent:
+            conn = self._open()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+
+        if self.per_thread:
+            conn = getattr(self._local, "conn", None)
+            if conn is None:
+                conn = self._local.conn = self._connect()
+            yield conn
+            return
+
+        # Shared connection: hold the lock for the whole block so two threads
+        # never interleave statements on it
+        with self._lock:
+            if self.conn is None:
+                self.conn = self._connect()
             yield self.conn
-        finally:
-            if self.conn:
-                self.conn.close()
-                self.conn = None
 
     def execute_query(self, query, params=()):
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query, params)
-            conn.commit()
-            return cursor.fetchall()
+            # Inside transaction() the commit or rollback happens once, at the end
+            in_transaction = getattr(self._local, "tx_conn", None) is not None
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+                if not in_transaction:
+                    conn.commit()
+            except BaseException:
+                # Don't leave the shared connection holding the write lock
+                if not in_transaction:
+                    conn.rollback()
+                raise
+            return rows
 
-    def create_tables(self):
+    @contextmanager
+    def transaction(self):
+        # Nested calls join the outer transaction
+        if getattr(self._local, "tx_conn", None) is not None:
+            with self.get_connection() as conn:
+                yield conn
+            return
+
+        with self.get_connection() as conn:
+            self._local.tx_conn = conn
+            try:
+                # A transaction left open by a failed statement would make
+                # BEGIN fail; it was never committed, so it's dropped
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.tx_conn = None
+
+    def diagnostics(self):
+        # Effective settings of the connection, for support/debugging
+        with self.get_connection() as conn:
+            info = {"db_name": self.db_name, "profile": self.profile,
+                    "sqlite_version": sqlite3.sqlite_version}
+            for pragma in PROFILES[self.profile]:
+                info[pragma] = conn.execute(f"PRAGMA {pragma}").fetchone()[0]
+            info["page_size"] = conn.execute("PRAGMA page_size").fetchone()[0]
+            return info
+
+    def migrate(self):
+        # Apply only the schema steps this file has not seen yet. On an
+        # up-to-date database this is a single PRAGMA read.
+        with self.get_connection() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return version
+
+        with self.transaction() as conn:
+            # Re-read under the write lock in case another till migrated first
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number in range(version + 1, len(MIGRATIONS) + 1):
+                for statement in MIGRATIONS[number - 1]:
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+        return len(MIGRATIONS)
+
+    def _get_page(self, table, after_id=None, limit=100, order_by="id", after_value=None):
+        # Keyset pagination: the next page starts right after the last row
+        # of the previous one (after_id), whatever the table size, instead of
+        # an OFFSET that rescans everything before it.
+        if order_by not in PAGE_ORDERINGS[table]:
+            raise ValueError(f"Cannot page {table} by {order_by}")
+
+        if after_id is None:
+            where, params = "", ()
+        elif order_by == "id":
+            where, params = "WHERE id > ?", (after_id,)
+        else:
+            if after_value is None:
+                # Look the sort value of the last row up from its id. If that
+                # row is gone its position is unknown: an empty page would
+                # read as the end of the table, so fail instead.
+                anchor = self.execute_query(f"SELECT {order_by} FROM {table} WHERE id = ?", (after_id,))
+                if not anchor:
+                    raise ValueError(f"Cannot page {table} by {order_by} after deleted row {after_id}, "
+                                     "pass its after_value")
+                after_value = anchor[0][0]
+            where, params = f"WHERE ({order_by}, id) > (?, ?)", (after_value, after_id)
+
+        order = "id" if order_by == "id" else f"{order_by}, id"
+        return self.execute_query(
+            f"SELECT * FROM {table} {where} ORDER BY {order} LIMIT ?",
+            params + (limit,)
+        )
+
+    def _iter_table(self, table, batch_size=500, order_by="id"):
+        # Stream a whole table one page at a time
+        after_id = after_value = None
+        while True:
+            rows = self._get_page(table, after_id, batch_size, order_by, after_value)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+            if order_by != "id":
+                after_value = rows[-1][PAGE_COLUMNS[table].index(order_by)]
+
+    def query_plan(self, query, params=()):
+        # EXPLAIN QUERY PLAN details, e.g. to check a query uses an index
         with self.get_connection() as conn:
-            # Drop existing invoices table if it exists
-            conn.execute("DROP TABLE IF EXISTS invoice_items")
-            conn.execute("DROP TABLE IF EXISTS invoices")
-            
-            # Recreate invoices table with type column
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS invoices (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    owner_id INTEGER,
-                    customer_id INTEGER,
-                    date TEXT NOT NULL,
-                    total REAL NOT NULL,
-                    type TEXT NOT NULL DEFAULT 'Bon de commande',
-                    FOREIGN KEY (owner_id) REFERENCES owner(id),
-                    FOREIGN KEY (customer_id) REFERENCES customers(id)
-                )
-            """)
-            
-            # Recreate invoice_items table
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS invoice_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    invoice_id INTEGER,
-                    product_id INTEGER,
-                    quantity INTEGER,
-                    price REAL,
-                    FOREIGN KEY (invoice_id) REFERENCES invoices(id),
-                    FOREIGN KEY (product_id) REFERENCES products(id)
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS owner (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    address TEXT NOT NULL,
-                    phone TEXT NOT NULL
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    price REAL NOT NULL
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS customers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    address TEXT NOT NULL,
-                    phone TEXT NOT NULL
-                )
-            """)
+            return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+    def create_tables(self):
+        return self.migrate()
 
     def add_owner(self, name, address, phone):
         return self.execute_query(
@@ -111,6 +670,193 @@ class Database:
     def get_invoices(self):
         return self.execute_query("SELECT * FROM invoices")
 
+    def get_invoices_page(self, after_id=None, limit=100, order_by="id", after_value=None):
+        return self._get_page("invoices", after_id, limit, order_by, after_value)
+
+    def iter_invoices(self, batch_size=500, order_by="id"):
+        return self._iter_table("invoices", batch_size, order_by)
+
+    @staticmethod
+    def _invoice_filter(date_from=None, date_to=None, invoice_type=None, customer_id=None):
+        # WHERE conditions for invoices dated between date_from and date_to
+        # ('YYYY-MM-DD', both days included), of a type and/or a customer
+        conditions, params = [], []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date < date(?, '+1 day')")
+            params.append(date_to)
+        if invoice_type:
+            conditions.append("type = ?")
+            params.append(invoice_type)
+        if customer_id is not None:
+            conditions.append("customer_id = ?")
+            params.append(customer_id)
+        return conditions, params
+
+    def get_invoice_ids(self, date_from=None, date_to=None, invoice_type=None, customer_id=None):
+        # Ids of the matching invoices, oldest first
+        conditions, params = self._invoice_filter(date_from, date_to, invoice_type, customer_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.execute_query(f"SELECT id FROM invoices {where} ORDER BY date, id", params)
+        return [row[0] for row in rows]
+
+    def count_invoices(self, date_from=None, date_to=None, invoice_type=None, customer_id=None):
+        conditions, params = self._invoice_filter(date_from, date_to, invoice_type, customer_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self.execute_query(f"SELECT COUNT(*) FROM invoices {where}", params)[0][0]
+
+    def get_invoice_history(self, after=None, limit=200, sort="date", descending=True,
+                            date_from=None, date_to=None, invoice_type=None, customer_id=None,
+                            text=None, invoice_id=None):
+        # One page of the invoice history: (id, date, customer name, type,
+        # total) rows matching the filters, sorted by a HISTORY_COLUMNS key.
+        # text keeps invoices whose customer or lines match it (full-text).
+        # Keyset pagination: after is the last row of the previous page.
+        if sort not in HISTORY_COLUMNS:
+            raise ValueError(f"Cannot sort invoice history by {sort}")
+        order = HISTORY_COLUMNS[sort]
+        conditions, params = self._invoice_filter(date_from, date_to, invoice_type, customer_id)
+
+        query = fts_query(text) if text else None
+        if query is not None:
+            conditions.append(
+                """invoices.id IN (
+                       SELECT invoice_items.invoice_id FROM invoice_items_fts 
+                       JOIN invoice_items ON invoice_items.id = invoice_items_fts.rowid 
+                       WHERE invoice_items_fts MATCH ? 
+                       UNION 
+                       SELECT invoices.id FROM customers_fts 
+                       JOIN invoices ON invoices.customer_id = customers_fts.rowid 
+                       WHERE customers_fts MATCH ?)""")
+            params += [query, query]
+        if invoice_id is not None:
+            conditions.append("invoices.id = ?")
+            params.append(invoice_id)
+        if after is not None:
+            conditions.append(f"({order}, invoices.id) {'<' if descending else '>'} (?, ?)")
+            params += [after[list(HISTORY_COLUMNS).index(sort)], after[0]]
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else ""
+        return self.execute_query(
+            f"""SELECT {', '.join(HISTORY_COLUMNS.values())} 
+                FROM invoices LEFT JOIN customers ON customers.id = invoices.customer_id 
+                {where} 
+                ORDER BY {order} {direction}, invoices.id {direction} LIMIT ?""",
+            params + [limit]
+        )
+
+    def iter_invoice_documents(self, date_from=None, date_to=None, invoice_type=None,
+                               customer_id=None, batch_size=200):
+        # Stream the matching invoices as invoice_data dicts, in id order,
+        # loading batch_size of them at a time
+        conditions, params = self._invoice_filter(date_from, date_to, invoice_type, customer_id)
+        after_id = 0
+        while True:
+            rows = self.execute_query(
+                f"""SELECT id FROM invoices 
+                    WHERE {' AND '.join(conditions + ['id > ?'])} 
+                    ORDER BY id LIMIT ?""",
+                params + [after_id, batch_size]
+            )
+            if not rows:
+                return
+            yield from self.get_invoice_documents([row[0] for row in rows])
+            after_id = rows[-1][0]
+
+    def get_invoice_documents(self, invoice_ids):
+        # Everything needed to render the given invoices, as the invoice_data
+        # dicts InvoicePDFGenerator takes: one query for the invoices with
+        # their customers and one for all of their lines.
+        documents = {}
+        for start in range(0, len(invoice_ids), 500):
+            chunk = list(invoice_ids[start:start + 500])
+            marks = ", ".join("?" * len(chunk))
+            for row in self.execute_query(
+                f"""SELECT invoices.id, invoices.date, invoices.type, invoices.total, 
+                           invoices.discount, customers.name, customers.address, customers.phone 
+                    FROM invoices LEFT JOIN customers ON customers.id = invoices.customer_id 
+                    WHERE invoices.id IN ({marks})""",
+                chunk
+            ):
+                documents[row[0]] = self._invoice_document(row)
+            for invoice_id, name, quantity, price in self.execute_query(
+                f"""SELECT invoice_id, name, quantity, price FROM invoice_items 
+                    WHERE invoice_id IN ({marks}) ORDER BY invoice_id, id""",
+                chunk
+            ):
+                self._add_document_item(documents[invoice_id], name, quantity, price)
+        return [documents[invoice_id] for invoice_id in invoice_ids if invoice_id in documents]
+
+    def get_invoice_document(self, invoice_id):
+        # One invoice with its customer and lines, in a single joined query,
+        # as an invoice_data dict (None if there is no such invoice)
+        rows = self.execute_query(
+            """SELECT invoices.id, invoices.date, invoices.type, invoices.total, 
+                      invoices.discount, customers.name, customers.address, customers.phone, 
+                      invoice_items.id, invoice_items.name, invoice_items.quantity, invoice_items.price 
+               FROM invoices 
+               LEFT JOIN customers ON customers.id = invoices.customer_id 
+               LEFT JOIN invoice_items ON invoice_items.invoice_id = invoices.id 
+               WHERE invoices.id = ? 
+               ORDER BY invoice_items.id""",
+            (invoice_id,)
+        )
+        if not rows:
+            return None
+        document = self._invoice_document(rows[0][:8])
+        for row in rows:
+            if row[8] is not None:
+                self._add_document_item(document, row[9], row[10], row[11])
+        return document
+
+    @staticmethod
+    def _invoice_document(row):
+        invoice_id, date, invoice_type, total, discount, name, address, phone = row
+        return {
+            'invoice_id': invoice_id,
+            'date': date,
+            'type': invoice_type,
+            'customer': {'name': name or '', 'address': address or '', 'phone': phone or ''},
+            'items': [],
+            'net_total': 0.0,
+            'discount': discount,
+            'total': total
+        }
+
+    @staticmethod
+    def _add_document_item(document, name, quantity, price):
+        total = quantity * price
+        document['items'].append({
+            'name': name or '',
+            'quantity': quantity,
+            'price': price,
+            'total': total
+        })
+        document['net_total'] += total
+
+    def get_invoices_by_type(self, invoice_type):
+        return self.execute_query(
+            """SELECT id, date, total, customer_id FROM invoices 
+               WHERE type = ? ORDER BY date DESC""",
+            (invoice_type,)
+        )
+
+    def get_customer_invoices(self, customer_id):
+        return self.execute_query(
+            "SELECT * FROM invoices WHERE customer_id = ? ORDER BY date DESC",
+            (customer_id,)
+        )
+
+    def get_invoice_items(self, invoice_id):
+        return self.execute_query(
+            """SELECT id, product_id, quantity, price FROM invoice_items 
+               WHERE invoice_id = ? ORDER BY id""",
+            (invoice_id,)
+        )
+
     def update_invoice(self, invoice_id, owner_id, customer_id, date, total, invoice_type):
         return self.execute_query(
             """UPDATE invoices 
@@ -123,14 +869,25 @@ class Database:
         return self.execute_query("DELETE FROM invoices WHERE id = ?", (invoice_id,))
 
     def add_product(self, name, description, price):
-        return self.execute_query(
-            "INSERT INTO products (name, description, price) VALUES (?, ?, ?)",
+        cursor = self.execute_query(
+            "INSERT INTO products (name, description, price) VALUES (?, ?, ?) RETURNING id",
             (name, description, price)
         )
+        return cursor[0][0] if cursor else None
+
+    def get_product(self, product_id):
+        rows = self.execute_query("SELECT * FROM products WHERE id = ?", (product_id,))
+        return rows[0] if rows else None
 
     def get_products(self):
         return self.execute_query("SELECT * FROM products")
 
+    def get_products_page(self, after_id=None, limit=100, order_by="id", after_value=None):
+        return self._get_page("products", after_id, limit, order_by, after_value)
+
+    def iter_products(self, batch_size=500, order_by="id"):
+        return self._iter_table("products", batch_size, order_by)
+
     def update_product(self, product_id, name, description, price):
         return self.execute_query(
             "UPDATE products SET name = ?, description = ?, price = ? WHERE id = ?",
@@ -141,14 +898,89 @@ class Database:
         return self.execute_query("DELETE FROM products WHERE id = ?", (product_id,))
 
     def add_customer(self, name, address, phone):
-        return self.execute_query(
-            "INSERT INTO customers (name, address, phone) VALUES (?, ?, ?)",
+        cursor = self.execute_query(
+            "INSERT INTO customers (name, address, phone) VALUES (?, ?, ?) RETURNING id",
             (name, address, phone)
         )
+        return cursor[0][0] if cursor else None
+
+    def get_customer(self, customer_id):
+        rows = self.execute_query("SELECT * FROM customers WHERE id = ?", (customer_id,))
+        return rows[0] if rows else None
 
     def get_customers(self):
         return self.execute_query("SELECT * FROM customers")
 
+    def get_customers_page(self, after_id=None, limit=100, order_by="id", after_value=None):
+        return self._get_page("customers", after_id, limit, order_by, after_value)
+
+    def iter_customers(self, batch_size=500, order_by="id"):
+        return self._iter_table("customers", batch_size, order_by)
+
+    def get_customer_rollups_page(self, after_id=None, limit=100):
+        # Customers in id order, each with its rollups (invoice count,
+        # revenue, last invoice date) read from customer_stats: one primary
+        # key lookup per row, never an aggregate over invoices
+        return self.execute_query(
+            f"""SELECT {CUSTOMER_ROLLUP_COLUMNS} 
+                FROM customers LEFT JOIN customer_stats ON customer_stats.customer_id = customers.id 
+                WHERE customers.id > ? ORDER BY customers.id LIMIT ?""",
+            (after_id or 0, limit)
+        )
+
+    def get_customer_choices(self):
+        # (id, name, phone) of every customer by name, for pickers
+        return self.execute_query("SELECT id, name, phone FROM customers ORDER BY name, id")
+
+    def get_customer_rollup(self, customer_id):
+        rows = self.execute_query(
+            f"""SELECT {CUSTOMER_ROLLUP_COLUMNS} 
+                FROM customers LEFT JOIN customer_stats ON customer_stats.customer_id = customers.id 
+                WHERE customers.id = ?""",
+            (customer_id,)
+        )
+        return rows[0] if rows else None
+
+    def check_customer_rollups(self):
+        # Compare customer_stats with the invoices. Returns the customers
+        # whose rollups are wrong as (customer_id, stored, actual) where each
+        # is (invoice count, revenue, last invoice date), or None if missing.
+        # Scans every invoice: meant for maintenance, not for the UI.
+        rows = self.execute_query(
+            f"""WITH actual AS ({CUSTOMER_ROLLUP_SOURCE}) 
+                SELECT actual.customer_id, 
+                       stats.invoice_count, stats.revenue, stats.last_invoice_date, 
+                       actual.invoice_count, actual.revenue, actual.last_invoice_date 
+                FROM actual LEFT JOIN customer_stats AS stats USING (customer_id) 
+                WHERE stats.customer_id IS NULL 
+                   OR stats.invoice_count != actual.invoice_count 
+                   OR abs(stats.revenue - actual.revenue) > 0.005 
+                   OR stats.last_invoice_date IS NOT actual.last_invoice_date 
+                UNION ALL 
+                SELECT stats.customer_id, 
+                       stats.invoice_count, stats.revenue, stats.last_invoice_date, 
+                       NULL, NULL, NULL 
+                FROM customer_stats AS stats 
+                WHERE NOT EXISTS (SELECT 1 FROM invoices WHERE invoices.customer_id = stats.customer_id) 
+                ORDER BY 1"""
+        )
+        return [
+            (row[0],
+             None if row[1] is None else tuple(row[1:4]),
+             None if row[4] is None else tuple(row[4:7]))
+            for row in rows
+        ]
+
+    def rebuild_customer_rollups(self):
+        # Recompute customer_stats from the invoices, e.g. after a failed
+        # check_customer_rollups. Returns the number of customers with invoices.
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM customer_stats")
+            return conn.execute(
+                f"""INSERT INTO customer_stats (customer_id, invoice_count, revenue, last_invoice_date) 
+                    {CUSTOMER_ROLLUP_SOURCE}"""
+            ).rowcount
+
     def update_customer(self, customer_id, name, address, phone):
         return self.execute_query(
             "UPDATE customers SET name = ?, address = ?, phone = ? WHERE id = ?",
@@ -158,20 +990,226 @@ class Database:
     def delete_customer(self, customer_id):
         return self.execute_query("DELETE FROM customers WHERE id = ?", (customer_id,))
 
-    def add_invoice_item(self, invoice_id, product_id, quantity, price):
+    def add_invoice_item(self, invoice_id, product_id, quantity, price, name=None):
         return self.execute_query(
             """INSERT INTO invoice_items 
-               (invoice_id, product_id, quantity, price) 
-               VALUES (?, ?, ?, ?)""",
-            (invoice_id, product_id, quantity, price)
+               (invoice_id, product_id, quantity, price, name) 
+               VALUES (?, ?, ?, ?, ?)""",
+            (invoice_id, product_id, quantity, price, name)
+        )
+
+    def save_invoice_bundle(self, customer, invoice, items):
+        # Customer, invoice and all of its lines in one transaction: either
+        # everything is saved or nothing is
+        with self.transaction() as conn:
+            customer_id = customer.get('id')
+            if customer_id is None:
+                customer_id = self._resolve_customer(conn, customer)
+
+            invoice_id = conn.execute(
+                """INSERT INTO invoices 
+                   (owner_id, customer_id, date, total, type, discount) 
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (invoice.get('owner_id'), customer_id, invoice['date'],
+                 invoice['total'], invoice['type'], invoice.get('discount', 0))
+            ).lastrowid
+
+            conn.executemany(
+                """INSERT INTO invoice_items 
+                   (invoice_id, product_id, quantity, price, name) 
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(invoice_id, item.get('product_id'), item['quantity'], item['price'],
+                  item.get('name'))
+                 for item in items]
+            )
+        return invoice_id
+
+    def update_invoice_bundle(self, invoice_id, customer, invoice, items):
+        # Replace an invoice's details and lines in one transaction. The
+        # invoice keeps its customer unless the customer details were changed,
+        # in which case it moves to the customer with the new details (found
+        # or saved, as in save_invoice_bundle), so the customer's other
+        # invoices are left as they were.
+        with self.transaction() as conn:
+            current = conn.execute(
+                """SELECT customers.id, customers.name, customers.address, customers.phone 
+                   FROM invoices JOIN customers ON customers.id = invoices.customer_id 
+                   WHERE invoices.id = ?""",
+                (invoice_id,)
+            ).fetchone()
+            details = (customer['name'], customer['address'], customer['phone'])
+            if current is not None and tuple(current[1:]) == details:
+                customer_id = current[0]
+            else:
+                customer_id = self._resolve_customer(conn, customer)
+
+            updated = conn.execute(
+                """UPDATE invoices SET customer_id = ?, total = ?, type = ?, discount = ? 
+                   WHERE id = ?""",
+                (customer_id, invoice['total'], invoice['type'], invoice.get('discount', 0),
+                 invoice_id)
+            ).rowcount
+            if not updated:
+                raise ValueError(f"Invoice {invoice_id} not found")
+
+            conn.execute("DELETE FROM invoice_items WHERE invoice_id = ?", (invoice_id,))
+            conn.executemany(
+                """INSERT INTO invoice_items 
+                   (invoice_id, product_id, quantity, price, name) 
+                   VALUES (?, ?, ?, ?, ?)""",
+                [(invoice_id, item.get('product_id'), item['quantity'], item['price'],
+                  item.get('name'))
+                 for item in items]
+            )
+        return invoice_id
+
+    @staticmethod
+    def _resolve_customer(conn, customer):
+        # Id of the customer with exactly these details, saved first if there
+        # is none, so repeat invoices add up on one customer (customer_stats).
+        # Different details (e.g. a new address) make a new customer: stored
+        # invoices keep printing the details they were made out to.
+        details = (customer['name'], customer['address'], customer['phone'])
+        row = conn.execute(
+            """SELECT id FROM customers WHERE name = ? AND address = ? AND phone = ? 
+               ORDER BY id LIMIT 1""",
+            details
+        ).fetchone()
+        if row is not None:
+            return row[0]
+        return conn.execute(
+            "INSERT INTO customers (name, address, phone) VALUES (?, ?, ?)", details
+        ).lastrowid
+
+    def delete_invoice_bundle(self, invoice_id):
+        # An invoice and its lines, in one transaction
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM invoice_items WHERE invoice_id = ?", (invoice_id,))
+            conn.execute("DELETE FROM invoices WHERE id = ?", (invoice_id,))
+
+    def search_products(self, text, limit=200):
+        query = fts_query(text)
+        if query is None:
+            return self.get_products_page(limit=limit)
+        return self.execute_query(
+            """SELECT products.* FROM products_fts 
+               JOIN products ON products.id = products_fts.rowid 
+               WHERE products_fts MATCH ? 
+               ORDER BY products_fts.rank LIMIT ?""",
+            (query, limit)
+        )
+
+    def search_customers(self, text, limit=200):
+        # Rows as get_customer_rollups_page, best match first
+        query = fts_query(text)
+        if query is None:
+            return self.get_customer_rollups_page(limit=limit)
+        return self.execute_query(
+            f"""SELECT {CUSTOMER_ROLLUP_COLUMNS} FROM customers_fts 
+                JOIN customers ON customers.id = customers_fts.rowid 
+                LEFT JOIN customer_stats ON customer_stats.customer_id = customers.id 
+                WHERE customers_fts MATCH ? 
+                ORDER BY customers_fts.rank LIMIT ?""",
+            (query, limit)
         )
 
+    def search_invoices(self, text, limit=200):
+        # Invoices whose customer or any of whose lines match, best match first.
+        # Rows: (id, date, customer name, type, total)
+        query = fts_query(text)
+        if query is None:
+            return self.execute_query(
+                """SELECT invoices.id, invoices.date, customers.name, invoices.type, invoices.total 
+                   FROM invoices LEFT JOIN customers ON customers.id = invoices.customer_id 
+                   ORDER BY invoices.date DESC LIMIT ?""",
+                (limit,)
+            )
+        return self.execute_query(
+            """WITH hits (invoice_id, rank) AS (
+                   SELECT invoice_items.invoice_id, invoice_items_fts.rank 
+                   FROM invoice_items_fts 
+                   JOIN invoice_items ON invoice_items.id = invoice_items_fts.rowid 
+                   WHERE invoice_items_fts MATCH ? 
+                   UNION ALL 
+                   SELECT invoices.id, customers_fts.rank 
+                   FROM customers_fts 
+                   JOIN invoices ON invoices.customer_id = customers_fts.rowid 
+                   WHERE customers_fts MATCH ?
+               ) 
+               SELECT invoices.id, invoices.date, customers.name, invoices.type, invoices.total 
+               FROM (SELECT invoice_id, MIN(rank) AS rank FROM hits GROUP BY invoice_id) AS best 
+               JOIN invoices ON invoices.id = best.invoice_id 
+               LEFT JOIN customers ON customers.id = invoices.customer_id 
+               ORDER BY best.rank, invoices.date DESC LIMIT ?""",
+            (query, query, limit)
+        )
+
+    def get_dashboard(self, today, months=12, top=10):
+        # Figures for the dashboard, read from the summary tables only (see
+        # migration 7), so the cost doesn't grow with the invoice history.
+        # today is a 'YYYY-MM-DD' string.
+        month_start = today[:8] + "01"
+        with self.get_connection() as conn:
+            day = conn.execute(
+                "SELECT invoice_count, revenue FROM daily_revenue WHERE day = ?", (today,)
+            ).fetchone()
+            month = conn.execute(
+                """SELECT coalesce(SUM(invoice_count), 0), coalesce(SUM(revenue), 0) 
+                   FROM daily_revenue WHERE day BETWEEN ? AND ?""",
+                (month_start, today)
+            ).fetchone()
+            overall = conn.execute(
+                "SELECT coalesce(SUM(invoice_count), 0), coalesce(SUM(revenue), 0) FROM type_summary"
+            ).fetchone()
+            return {
+                'today': tuple(day) if day else (0, 0.0),
+                'month': tuple(month),
+                'overall': tuple(overall),
+                # Customers with invoices who still exist (stats outlive a
+                # deleted customer until their invoices go)
+                'customer_count': conn.execute(
+                    """SELECT COUNT(*) FROM customer_stats 
+                       JOIN customers ON customers.id = customer_stats.customer_id"""
+                ).fetchone()[0],
+                # (month 'YYYY-MM', invoice count, revenue), newest first
+                'monthly': conn.execute(
+                    """SELECT substr(day, 1, 7), SUM(invoice_count), SUM(revenue) 
+                       FROM daily_revenue WHERE day >= date(?, ?) 
+                       GROUP BY 1 ORDER BY 1 DESC""",
+                    (month_start, f"-{months - 1} months")
+                ).fetchall(),
+                # (type, invoice count, revenue)
+                'types': conn.execute(
+                    "SELECT type, invoice_count, revenue FROM type_summary ORDER BY revenue DESC"
+                ).fetchall(),
+                # (customer name, invoice count, revenue)
+                'top_customers': conn.execute(
+                    """SELECT customers.name, customer_stats.invoice_count, customer_stats.revenue 
+                       FROM customer_stats JOIN customers ON customers.id = customer_stats.customer_id 
+                       ORDER BY customer_stats.revenue DESC LIMIT ?""",
+                    (top,)
+                ).fetchall(),
+                # (product name, quantity, revenue)
+                'top_products': conn.execute(
+                    "SELECT name, quantity, revenue FROM product_sales ORDER BY revenue DESC LIMIT ?",
+                    (top,)
+                ).fetchall(),
+            }
+
+    def interrupt(self):
+        # Abort whatever query is running on this database's connections
+        # (it raises sqlite3.OperationalError: interrupted)
+        with self._registry_lock:
+            connections = list(self._connections)
+        for conn in connections:
+            conn.interrupt()
+
     def close(self):
-        if self.conn:
-            self.conn.close()
+        with self._lock, self._registry_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
             self.conn = None
+            self._local = threading.local()
 
 
-db = Database()
-db.create_tables()
-
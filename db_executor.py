@@ -0,0 +1,72 @@
+from PyQt5.QtCore import QObject, QThread, pyqtSignal, pyqtSlot
+
+
+class DatabaseWorker(QObject):
+    done = pyqtSignal(int, object)
+    failed = pyqtSignal(int, object)
+
+    @pyqtSlot(int, object, object, object)
+    def run(self, job_id, func, args, kwargs):
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.failed.emit(job_id, e)
+            return
+        self.done.emit(job_id, result)
+
+
+class DatabaseExecutor(QObject):
+    # Runs database calls on one dedicated worker thread so the GUI never
+    # waits on disk or locks. Calls run in submission order; on_result /
+    # on_error are invoked back on the GUI thread. Failures without an
+    # on_error handler are reported through the `error` signal.
+    busy_changed = pyqtSignal(bool)
+    error = pyqtSignal(str)
+    _request = pyqtSignal(int, object, object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._jobs = {}
+        self._next_id = 0
+        self._thread = QThread()
+        self._worker = DatabaseWorker()
+        self._worker.moveToThread(self._thread)
+        self._request.connect(self._worker.run)
+        self._worker.done.connect(self._on_done)
+        self._worker.failed.connect(self._on_failed)
+        self._thread.start()
+
+    def submit(self, func, *args, on_result=None, on_error=None, **kwargs):
+        self._next_id += 1
+        job_id = self._next_id
+        self._jobs[job_id] = (on_result, on_error)
+        if len(self._jobs) == 1:
+            self.busy_changed.emit(True)
+        self._request.emit(job_id, func, args, kwargs)
+        return job_id
+
+    def is_busy(self):
+        return bool(self._jobs)
+
+    def _finish(self, job_id):
+        callbacks = self._jobs.pop(job_id, (None, None))
+        if not self._jobs:
+            self.busy_changed.emit(False)
+        return callbacks
+
+    def _on_done(self, job_id, result):
+        on_result, _ = self._finish(job_id)
+        if on_result is not None:
+            on_result(result)
+
+    def _on_failed(self, job_id, exception):
+        _, on_error = self._finish(job_id)
+        if on_error is not None:
+            on_error(exception)
+        else:
+            self.error.emit(str(exception))
+
+    def shutdown(self):
+        # Let queued calls finish, then stop the thread
+        self._thread.quit()
+        self._thread.wait()
@@ -150,4 +150,134 @@ class CustomerDialog(QtWidgets.QDialog):
 
         # Connect buttons
         self.save_button.clicked.connect(self.accept)
-        self.cancel_button.clicked.connect(self.reject)
\ No newline at end of file
+        self.cancel_button.clicked.connect(self.reject)
+
+class ExportDialog(QtWidgets.QDialog):
+    def __init__(self, invoice_types, customers=()):
+        super().__init__()
+        self.invoice_types = invoice_types
+        self.customers = customers      # (id, name, phone) rows
+        self.setupUi()
+
+    def setupUi(self):
+        self.setWindowTitle("Export Invoices")
+        self.setFixedSize(400, 340)
+        self.setStyleSheet("""
+            QDialog {
+                background-color: rgb(255, 255, 255);
+            }
+            QDateEdit, QComboBox {
+                height: 29px;
+                border-radius: 8px;
+                border: 1px solid #404040;
+                background: #FFF;
+                padding: 5px;
+            }
+            QPushButton {
+                color: #FFF;
+                font-family: Roboto;
+                font-size: 12px;
+                font-weight: 500;
+                border-radius: 8px;
+                background: #9747FF;
+                padding: 10px;
+            }
+            QLabel {
+                color: #404040;
+                font-family: Roboto;
+                font-size: 12px;
+                font-weight: 500;
+            }
+        """)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        today = QtCore.QDate.currentDate()
+
+        # Date range (first day of the month up to today by default)
+        from_layout = QtWidgets.QHBoxLayout()
+        self.from_label = QtWidgets.QLabel("From:")
+        self.from_input = QtWidgets.QDateEdit(QtCore.QDate(today.year(), today.month(), 1))
+        self.from_input.setCalendarPopup(True)
+        self.from_input.setDisplayFormat("yyyy-MM-dd")
+        from_layout.addWidget(self.from_label)
+        from_layout.addWidget(self.from_input)
+        layout.addLayout(from_layout)
+
+        to_layout = QtWidgets.QHBoxLayout()
+        self.to_label = QtWidgets.QLabel("To:")
+        self.to_input = QtWidgets.QDateEdit(today)
+        self.to_input.setCalendarPopup(True)
+        self.to_input.setDisplayFormat("yyyy-MM-dd")
+        to_layout.addWidget(self.to_label)
+        to_layout.addWidget(self.to_input)
+        layout.addLayout(to_layout)
+
+        # Invoice type
+        type_layout = QtWidgets.QHBoxLayout()
+        self.type_label = QtWidgets.QLabel("Type:")
+        self.type_input = QtWidgets.QComboBox()
+        self.type_input.addItems(["All"] + list(self.invoice_types))
+        type_layout.addWidget(self.type_label)
+        type_layout.addWidget(self.type_input)
+        layout.addLayout(type_layout)
+
+        # Customer: type to filter the list by name or phone
+        customer_layout = QtWidgets.QHBoxLayout()
+        self.customer_label = QtWidgets.QLabel("Customer:")
+        self.customer_input = QtWidgets.QComboBox()
+        self.customer_input.setEditable(True)
+        self.customer_input.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+        self.customer_input.addItem("All", None)
+        for customer_id, name, phone in self.customers:
+            self.customer_input.addItem(f"{name} ({phone})" if phone else name, customer_id)
+        completer = self.customer_input.completer()
+        completer.setFilterMode(QtCore.Qt.MatchContains)
+        completer.setCompletionMode(QtWidgets.QCompleter.PopupCompletion)
+        customer_layout.addWidget(self.customer_label)
+        customer_layout.addWidget(self.customer_input)
+        layout.addLayout(customer_layout)
+
+        # Output format
+        format_layout = QtWidgets.QHBoxLayout()
+        self.format_label = QtWidgets.QLabel("Format:")
+        self.format_input = QtWidgets.QComboBox()
+        self.format_input.addItems(["Single PDF", "ZIP of PDFs"])
+        format_layout.addWidget(self.format_label)
+        format_layout.addWidget(self.format_input)
+        layout.addLayout(format_layout)
+
+        # Buttons
+        button_layout = QtWidgets.QHBoxLayout()
+        self.save_button = QtWidgets.QPushButton("Export")
+        self.cancel_button = QtWidgets.QPushButton("Cancel")
+        self.cancel_button.setStyleSheet("background: #404040;")
+        button_layout.addWidget(self.save_button)
+        button_layout.addWidget(self.cancel_button)
+        layout.addLayout(button_layout)
+
+        # Connect buttons
+        self.save_button.clicked.connect(self.accept)
+        self.cancel_button.clicked.connect(self.reject)
+
+    def accept(self):
+        # A typed name that matches no customer would export everyone
+        if self.customer_input.findText(self.customer_input.currentText()) < 0:
+            QtWidgets.QMessageBox.warning(self, "Export Invoices", "Pick a customer from the list")
+            return
+        super().accept()
+
+    def customer_id(self):
+        index = self.customer_input.findText(self.customer_input.currentText())
+        return self.customer_input.itemData(index) if index > 0 else None
+
+    def filters(self):
+        invoice_type = self.type_input.currentText()
+        return {
+            'date_from': self.from_input.date().toString("yyyy-MM-dd"),
+            'date_to': self.to_input.date().toString("yyyy-MM-dd"),
+            'invoice_type': None if invoice_type == "All" else invoice_type,
+            'customer_id': self.customer_id()
+        }
+
+    def is_zip(self):
+        return self.format_input.currentIndex() == 1
@@ -0,0 +1,140 @@
+# invoice_batch.py
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from invoice_pdf import InvoicePDFGenerator
+
+
+def render_invoice_file(invoice_data, filename):
+    # Runs in a worker process, so it must stay a module-level function
+    InvoicePDFGenerator(invoice_data).generate(filename)
+    return filename
+
+
+def render_invoice(db, invoice_id, output=None, cache=None):
+    # Render a stored invoice, from the database rather than from the GUI.
+    # Returns the PDF bytes, or writes them to output (a filename or a
+    # binary file-like object) and returns output. With a PDFCache an
+    # unchanged invoice is not rendered again.
+    document = db.get_invoice_document(invoice_id)
+    if document is None:
+        raise ValueError(f"Invoice {invoice_id} not found")
+    if cache is not None:
+        pdf = cache.render(document)
+    else:
+        pdf = InvoicePDFGenerator(document).to_bytes()
+    if output is None:
+        return pdf
+    if hasattr(output, "write"):
+        output.write(pdf)
+    else:
+        with open(output, "wb") as f:
+            f.write(pdf)
+    return output
+
+
+class BatchResult:
+    def __init__(self):
+        self.files = {}         # invoice id -> written PDF
+        self.failures = {}      # invoice id -> error message
+        self.elapsed = 0.0
+
+    @property
+    def throughput(self):
+        # Rendered invoices per second
+        return len(self.files) / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"{len(self.files)} rendered, {len(self.failures)} failed "
+                f"in {self.elapsed:.1f}s ({self.throughput:.1f} invoices/s)")
+
+
+class BatchRenderer:
+    # Re-renders stored invoices in bulk. Invoice data is loaded from the
+    # database in chunks and rendered in parallel by a process pool, one
+    # PDF per invoice in output_dir.
+    def __init__(self, db, output_dir, workers=None, chunk_size=200):
+        self.db = db
+        self.output_dir = output_dir
+        self.workers = workers or os.cpu_count()
+        self.chunk_size = chunk_size
+
+    def render(self, invoice_ids=None, date_from=None, date_to=None):
+        if invoice_ids is None:
+            invoice_ids = self.db.get_invoice_ids(date_from, date_to)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        result = BatchResult()
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            for start in range(0, len(invoice_ids), self.chunk_size):
+                chunk = invoice_ids[start:start + self.chunk_size]
+                documents = self.db.get_invoice_documents(chunk)
+                found = {document['invoice_id'] for document in documents}
+                for invoice_id in chunk:
+                    if invoice_id not in found:
+                        result.failures[invoice_id] = "Invoice not found"
+
+                futures = {
+                    pool.submit(render_invoice_file, document, self.filename(document['invoice_id'])):
+                        document['invoice_id']
+                    for document in documents
+                }
+                # Wait for the chunk before loading the next one, so only one
+                # chunk of invoice data is held in memory at a time
+                for future in as_completed(futures):
+                    invoice_id = futures[future]
+                    try:
+                        result.files[invoice_id] = future.result()
+                    except Exception as e:
+                        result.failures[invoice_id] = str(e)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    def filename(self, invoice_id):
+        return os.path.join(self.output_dir, f"invoice_{invoice_id}.pdf")
+
+
+# ReportLab keeps every drawn page in memory until the file is written, so
+# one merged PDF is only offered up to this many invoices; export_zip
+# streams any number of them
+MAX_PDF_INVOICES = 1000
+
+
+def export_pdf(db, output, **filters):
+    # All invoices matching the filters (see Database.iter_invoice_documents)
+    # in one PDF. Invoices are loaded from the database in batches and the
+    # static template parts are shared by every page. Raises ValueError for
+    # more than MAX_PDF_INVOICES invoices.
+    # Returns the number of invoices exported.
+    matching = db.count_invoices(**filters)
+    if matching > MAX_PDF_INVOICES:
+        raise ValueError(f"{matching} invoices are too many for one PDF (at most {MAX_PDF_INVOICES}), "
+                         "export them as a ZIP instead")
+    c = canvas.Canvas(output, pagesize=A4)
+    count = 0
+    for document in db.iter_invoice_documents(**filters):
+        InvoicePDFGenerator(document).draw(c)
+        count += 1
+    if count == 0:
+        c.drawString(50, A4[1] - 50, "No invoices")
+    c.save()
+    return count
+
+
+def export_zip(db, output, **filters):
+    # One PDF per matching invoice, in a ZIP archive written as it goes, so
+    # only one rendered invoice is held in memory at a time.
+    # Returns the number of invoices exported.
+    count = 0
+    with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+        for document in db.iter_invoice_documents(**filters):
+            archive.writestr(f"invoice_{document['invoice_id']}.pdf",
+                             InvoicePDFGenerator(document).to_bytes())
+            count += 1
+    return count
@@ -1,65 +1,265 @@
 # invoice_pdf.py
 from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
+from reportlab.lib.utils import simpleSplit
 from datetime import datetime
+from hashlib import md5
+from io import BytesIO
 import os
+import uuid
+
+from pdf_fonts import fonts_for, shape
+
+# Bump whenever the layout changes, so cached PDFs are not reused
+TEMPLATE_VERSION = 3
+
+TABLE_HEADERS = ["Product", "Quantity", "Unit Price", "Total"]
+
+class InvoiceTemplate:
+    # The static parts of an invoice of one type (titles, labels, table
+    # header, totals labels), built once per process. When several invoices
+    # share one PDF each part is drawn once as a form XObject and stamped
+    # wherever it is needed, so only the variable fields are drawn per
+    # invoice. A PDF holding a single invoice draws them inline: the parts
+    # are only a few short strings, smaller than a form definition.
+    # Parts that move with the content are drawn at ANCHOR and shifted
+    # into place.
+    ANCHOR = 400
+
+    def __init__(self, invoice_type, fonts):
+        self.invoice_type = invoice_type
+        self.width, self.height = A4
+        self.font, self.bold_font = fonts
+        digest = md5(f"{TEMPLATE_VERSION}:{self.font}:{invoice_type}".encode("utf-8")).hexdigest()[:12]
+        self.names = {part: f"tpl{digest}{part}" for part in ("first", "next", "table", "totals")}
+
+        # Where the values go, right after their labels
+        self.value_x = {
+            label: 50 + stringWidth(label, self.font, 10)
+            for label in ("Date: ", "Invoice #: ", "Company: ", "Address: ", "Phone: ")
+        }
+        self.totals_x = {
+            label: 300 + stringWidth(label, self.bold_font, 10)
+            for label in ("Net Total: ", "Discount: ", "Total: ")
+        }
+
+    def stamp(self, c, part, y=None, reuse=True):
+        name = self.names[part]
+        if reuse and not c.hasForm(name):
+            c.beginForm(name)
+            self._draw_part(c, part)
+            c.endForm()
+        if y is not None:
+            c.saveState()
+            c.translate(0, y - self.ANCHOR)
+        if reuse:
+            c.doForm(name)
+        else:
+            self._draw_part(c, part)
+        if y is not None:
+            c.restoreState()
+
+    def _draw_part(self, c, part):
+        if part == "first":
+            c.setFont(self.bold_font, 20)
+            c.drawString(50, self.height - 50, self.invoice_type)
+            c.setFont(self.font, 10)
+            c.drawString(50, self.height - 70, "Date: ")
+            c.drawString(50, self.height - 85, "Invoice #: ")
+            c.setFont(self.bold_font, 12)
+            c.drawString(50, self.height - 120, "Customer Information")
+            c.setFont(self.font, 10)
+            c.drawString(50, self.height - 140, "Company: ")
+            c.drawString(50, self.height - 155, "Address: ")
+            c.drawString(50, self.height - 170, "Phone: ")
+        elif part == "next":
+            c.setFont(self.bold_font, 12)
+            c.drawString(50, self.height - 50, f"{self.invoice_type} (continued)")
+            c.setFont(self.font, 10)
+            c.drawString(50, self.height - 65, "Invoice #: ")
+        elif part == "table":
+            c.setFont(self.bold_font, 10)
+            for header, x in zip(TABLE_HEADERS, InvoicePDFGenerator.COLUMNS):
+                c.drawString(x, self.ANCHOR, header)
+        elif part == "totals":
+            c.setFont(self.bold_font, 10)
+            c.drawString(300, self.ANCHOR, "Net Total: ")
+            c.drawString(300, self.ANCHOR - 20, "Discount: ")
+            c.drawString(300, self.ANCHOR - 40, "Total: ")
+
+_templates = {}
+
+def get_template(invoice_type, fonts):
+    # Templates are built once per process and shared by every invoice
+    template = _templates.get((invoice_type, fonts))
+    if template is None:
+        template = _templates[invoice_type, fonts] = InvoiceTemplate(invoice_type, fonts)
+    return template
 
 class InvoicePDFGenerator:
+    # Items table geometry
+    COLUMNS = [50, 200, 300, 400]
+    NAME_WIDTH = 140          # product names wrap inside the first column
+    LINE_HEIGHT = 14
+    ROW_PADDING = 6
+    FIRST_TABLE_TOP = 220     # distance from the page top, first page
+    NEXT_TABLE_TOP = 90       # continuation pages
+    BOTTOM_MARGIN = 60
+    TOTALS_HEIGHT = 60
+
     def __init__(self, invoice_data):
         self.invoice_data = invoice_data
         self.width, self.height = A4
 
     def generate(self, filename=None):
+        # Write the PDF to a file and return its name
         if not filename:
-            filename = f"invoice_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        
-        c = canvas.Canvas(filename, pagesize=A4)
-        self._draw_header(c)
-        self._draw_customer_info(c)
-        self._draw_items_table(c)
-        self._draw_totals(c)
-        c.save()
+            filename = f"invoice_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}.pdf"
+        self.render(filename)
         return filename
 
+    def to_bytes(self):
+        # Render in memory, e.g. to send to a printer spool, an archive or
+        # an HTTP response without going through the disk
+        buffer = BytesIO()
+        self.render(buffer)
+        return buffer.getvalue()
+
+    def render(self, output):
+        # output is a filename or a binary file-like object
+        c = canvas.Canvas(output, pagesize=A4)
+        self.draw(c, shared=False)
+        c.save()
+
+    def draw(self, c, shared=True):
+        # Draw the invoice's pages onto a canvas. shared=True when the canvas
+        # holds other invoices too: the template forms are then reused
+        # across all of them.
+        self.font, self.bold_font = self.fonts()
+        self.template = get_template(self.invoice_data['type'], (self.font, self.bold_font))
+        pages, totals_y = self._layout()
+        self.reuse_template = shared
+        for number, rows in enumerate(pages, start=1):
+            if number == 1:
+                self._draw_header(c)
+                self._draw_customer_info(c)
+                table_y = self.height - self.FIRST_TABLE_TOP
+            else:
+                self._draw_continuation_header(c)
+                table_y = self.height - self.NEXT_TABLE_TOP
+            if rows:
+                self._draw_items_table(c, table_y, rows)
+            if number == len(pages):
+                self._draw_totals(c, totals_y)
+            self._draw_page_number(c, number, len(pages))
+            c.showPage()
+
+    def fonts(self):
+        # (regular, bold) fonts this invoice is drawn with
+        return fonts_for(self._texts())
+
+    def _texts(self):
+        customer = self.invoice_data['customer']
+        yield self.invoice_data['type']
+        yield customer['name']
+        yield customer['address']
+        yield customer['phone']
+        for item in self.invoice_data['items']:
+            yield item['name']
+
+    def _layout(self):
+        # Split the items into pages. Returns the rows of every page as
+        # (item, wrapped name lines, y) and the y of the totals block,
+        # which goes under the last row (on a page of its own if needed).
+        # A row that doesn't fit moves to the next page; one that can't fit
+        # there either (a very long name) has its lines split across pages,
+        # the later parts with item None.
+        pages = [[]]
+        y = self.height - self.FIRST_TABLE_TOP - 20
+        next_top = self.height - self.NEXT_TABLE_TOP - 20
+        for item in self.invoice_data['items']:
+            lines = simpleSplit(str(item['name']), self.font, 10, self.NAME_WIDTH) or ['']
+            if len(lines) > self._fitting_lines(y) and pages[-1] \
+                    and len(lines) <= self._fitting_lines(next_top):
+                pages.append([])
+                y = next_top
+            while len(lines) > self._fitting_lines(y):
+                fitting = self._fitting_lines(y)
+                if fitting:
+                    pages[-1].append((item, lines[:fitting], y))
+                    item, lines = None, lines[fitting:]
+                pages.append([])
+                y = next_top
+            pages[-1].append((item, lines, y))
+            y -= len(lines) * self.LINE_HEIGHT + self.ROW_PADDING
+
+        totals_y = y - 10
+        if totals_y - self.TOTALS_HEIGHT < self.BOTTOM_MARGIN:
+            pages.append([])
+            totals_y = self.height - self.NEXT_TABLE_TOP
+        return pages, totals_y
+
+    def _fitting_lines(self, y):
+        # Name lines of a row starting at y that fit above the bottom margin
+        room = y - self.BOTTOM_MARGIN - self.ROW_PADDING
+        return int(room // self.LINE_HEIGHT) + 1 if room >= 0 else 0
+
     def _draw_header(self, c):
-        # Company logo/header
-        c.setFont("Helvetica-Bold", 20)
-        c.drawString(50, self.height - 50, self.invoice_data['type'])
-        c.setFont("Helvetica", 10)
-        c.drawString(50, self.height - 70, f"Date: {datetime.now().strftime('%Y-%m-%d')}")
-        c.drawString(50, self.height - 85, f"Invoice #: {self.invoice_data.get('invoice_id', '')}")
+        value_x = self.template.value_x
+        self.template.stamp(c, "first", reuse=self.reuse_template)
+        c.setFont(self.font, 10)
+        c.drawString(value_x["Date: "], self.height - 70, self.invoice_date())
+        c.drawString(value_x["Invoice #: "], self.height - 85, str(self.invoice_data.get('invoice_id', '')))
+
+    def invoice_date(self):
+        # Stored invoices carry their own date ('YYYY-MM-DD HH:MM:SS')
+        date = self.invoice_data.get('date')
+        if date:
+            return str(date)[:10]
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def _draw_continuation_header(self, c):
+        self.template.stamp(c, "next", reuse=self.reuse_template)
+        c.setFont(self.font, 10)
+        c.drawString(self.template.value_x["Invoice #: "], self.height - 65,
+                     str(self.invoice_data.get('invoice_id', '')))
 
     def _draw_customer_info(self, c):
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(50, self.height - 120, "Customer Information")
-        c.setFont("Helvetica", 10)
-        c.drawString(50, self.height - 140, f"Company: {self.invoice_data['customer']['name']}")
-        c.drawString(50, self.height - 155, f"Address: {self.invoice_data['customer']['address']}")
-        c.drawString(50, self.height - 170, f"Phone: {self.invoice_data['customer']['phone']}")
-
-    def _draw_items_table(self, c):
-        # Table header
-        y = self.height - 220
-        headers = ["Product", "Quantity", "Unit Price", "Total"]
-        x_positions = [50, 200, 300, 400]
-        
-        c.setFont("Helvetica-Bold", 10)
-        for header, x in zip(headers, x_positions):
-            c.drawString(x, y, header)
-        
+        value_x = self.template.value_x
+        customer = self.invoice_data['customer']
+        c.setFont(self.font, 10)
+        # Customer names and addresses are often Arabic
+        c.drawString(value_x["Company: "], self.height - 140, shape(customer['name']))
+        c.drawString(value_x["Address: "], self.height - 155, shape(customer['address']))
+        c.drawString(value_x["Phone: "], self.height - 170, shape(customer['phone']))
+
+    def _draw_items_table(self, c, y, rows):
+        # Table header, repeated on every page
+        self.template.stamp(c, "table", y, self.reuse_template)
+        x_positions = self.COLUMNS
+
         # Table content
-        c.setFont("Helvetica", 10)
-        for item in self.invoice_data['items']:
-            y -= 20
-            c.drawString(x_positions[0], y, str(item['name']))
-            c.drawString(x_positions[1], y, str(item['quantity']))
-            c.drawString(x_positions[2], y, f"{item['price']:.2f}")
-            c.drawString(x_positions[3], y, f"{item['total']:.2f}")
-
-    def _draw_totals(self, c):
-        y = self.height - 500
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(300, y, f"Net Total: {self.invoice_data['net_total']:.2f}")
-        c.drawString(300, y - 20, f"Discount: {self.invoice_data['discount']}%")
-        c.drawString(300, y - 40, f"Total: {self.invoice_data['total']:.2f}")
\ No newline at end of file
+        c.setFont(self.font, 10)
+        for item, lines, row_y in rows:
+            for number, line in enumerate(lines):
+                c.drawString(x_positions[0], row_y - number * self.LINE_HEIGHT, line)
+            if item is None:
+                continue    # rest of a row split across pages
+            c.drawString(x_positions[1], row_y, str(item['quantity']))
+            c.drawString(x_positions[2], row_y, f"{item['price']:.2f}")
+            c.drawString(x_positions[3], row_y, f"{item['total']:.2f}")
+
+    def _draw_totals(self, c, y):
+        totals_x = self.template.totals_x
+        self.template.stamp(c, "totals", y, self.reuse_template)
+        c.setFont(self.bold_font, 10)
+        c.drawString(totals_x["Net Total: "], y, f"{self.invoice_data['net_total']:.2f}")
+        c.drawString(totals_x["Discount: "], y - 20, f"{self.invoice_data['discount']}%")
+        c.drawString(totals_x["Total: "], y - 40, f"{self.invoice_data['total']:.2f}")
+
+    def _draw_page_number(self, c, number, count):
+        if count > 1:
+            c.setFont(self.font, 8)
+            c.drawRightString(self.width - 50, 30, f"Page {number} / {count}")
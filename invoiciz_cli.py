@@ -0,0 +1,127 @@
+# invoiciz_cli.py
+# Command-line rendering and export of stored invoices, without Qt or a
+# display. Uses the same database and PDF code as the application.
+#
+#   python invoiciz_cli.py render --id 42 -o invoice_42.pdf
+#   python invoiciz_cli.py export --from 2024-01-01 --to 2024-12-31 --format zip -o 2024.zip
+#   python invoiciz_cli.py batch --from 2024-01-01 -o invoices/
+#   python invoiciz_cli.py rollups check
+import argparse
+import os
+import sys
+from datetime import date
+
+from database import Database
+from invoice_batch import BatchRenderer, export_pdf, export_zip, render_invoice
+from pdf_cache import PDFCache
+
+
+def iso_date(value):
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD")
+
+
+def add_filters(parser):
+    parser.add_argument("--from", dest="date_from", type=iso_date, help="first invoice date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=iso_date, help="last invoice date, inclusive")
+    parser.add_argument("--type", dest="invoice_type", help="only invoices of this type")
+    parser.add_argument("--customer", dest="customer_id", type=int, help="only invoices of this customer id")
+
+
+def filters(args):
+    return {
+        'date_from': args.date_from,
+        'date_to': args.date_to,
+        'invoice_type': args.invoice_type,
+        'customer_id': args.customer_id,
+    }
+
+
+def render(db, args):
+    # Same cache as the application, next to the database
+    cache = None
+    if not args.no_cache:
+        cache = PDFCache(os.path.join(os.path.dirname(os.path.abspath(db.db_name)), "pdf_cache"))
+    output = args.output or f"invoice_{args.id}.pdf"
+    if output == "-":
+        sys.stdout.buffer.write(render_invoice(db, args.id, cache=cache))
+    else:
+        render_invoice(db, args.id, output, cache=cache)
+        print(output)
+
+
+def export(db, args):
+    fmt = args.format or ("zip" if args.output.lower().endswith(".zip") else "pdf")
+    export = export_zip if fmt == "zip" else export_pdf
+    count = export(db, args.output, **filters(args))
+    print(f"{count} invoices exported to {args.output}")
+
+
+def batch(db, args):
+    renderer = BatchRenderer(db, args.output, workers=args.workers)
+    result = renderer.render(db.get_invoice_ids(**filters(args)))
+    for invoice_id, error in sorted(result.failures.items()):
+        print(f"invoice {invoice_id}: {error}", file=sys.stderr)
+    print(result.summary())
+    return 1 if result.failures else 0
+
+
+def rollups(db, args):
+    # customer_stats is kept up to date by triggers; these are for checking
+    # it against the invoices, and repairing it
+    if args.action == "rebuild":
+        print(f"customer rollups rebuilt for {db.rebuild_customer_rollups()} customers")
+        return 0
+    mismatches = db.check_customer_rollups()
+    for customer_id, stored, actual in mismatches:
+        print(f"customer {customer_id}: stored {stored}, actual {actual}", file=sys.stderr)
+    print(f"{len(mismatches)} customers with wrong rollups")
+    return 1 if mismatches else 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="invoiciz_cli", description="Render and export invoices")
+    parser.add_argument("--db", default="invoiciz.db", help="database file (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = commands.add_parser("render", help="render one stored invoice")
+    render_parser.add_argument("--id", type=int, required=True, help="invoice id")
+    render_parser.add_argument("-o", "--output", help="PDF file, or - for stdout (default: invoice_<id>.pdf)")
+    render_parser.add_argument("--no-cache", action="store_true", help="always render, bypassing the PDF cache")
+    render_parser.set_defaults(handler=render)
+
+    export_parser = commands.add_parser("export", help="export invoices as one PDF or a ZIP of PDFs")
+    add_filters(export_parser)
+    export_parser.add_argument("--format", choices=["pdf", "zip"], help="default: from the output extension")
+    export_parser.add_argument("-o", "--output", required=True, help="output file")
+    export_parser.set_defaults(handler=export)
+
+    batch_parser = commands.add_parser("batch", help="render invoices to one PDF each, in parallel")
+    add_filters(batch_parser)
+    batch_parser.add_argument("-o", "--output", required=True, help="output directory")
+    batch_parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    batch_parser.set_defaults(handler=batch)
+
+    rollups_parser = commands.add_parser("rollups", help="check or rebuild the customer invoice rollups")
+    rollups_parser.add_argument("action", choices=["check", "rebuild"])
+    rollups_parser.set_defaults(handler=rollups)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db = Database(args.db)
+    try:
+        db.migrate()
+        return args.handler(db, args) or 0
+    except ValueError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,40 @@
 from PyQt5 import QtWidgets, QtGui
-from PyQt5.QtCore import Qt, QAbstractTableModel
+from PyQt5.QtCore import (Qt, QAbstractTableModel, QModelIndex, QObject, QRunnable,
+                          QSortFilterProxyModel, QThreadPool, QTimer, pyqtSignal)
 from PyQt5.QtWidgets import QTableView
 from invoiciz import Ui_MainWindow
-from dialogs import ProductDialog, CustomerDialog
-from database import Database
-from invoice_pdf import InvoicePDFGenerator
+from dialogs import ProductDialog, CustomerDialog, ExportDialog
+from database import Database, HISTORY_COLUMNS
+from db_executor import DatabaseExecutor
+from invoice_batch import export_pdf, export_zip, render_invoice
+from pdf_cache import PDFCache
 import sys , os
+import functools
+import sqlite3
+import tempfile
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from datetime import datetime
 
+INVOICE_TYPES = ["Bon de commande", "Bon d'achat", "Bon de vente", "Bon de livraison"]
+
+# Column layouts of the search result tables, as (header, type)
+PRODUCT_COLUMNS = [('ID', int), ('Name', str), ('Description', str), ('Price', float)]
+CUSTOMER_COLUMNS = [('ID', int), ('Name', str), ('Address', str), ('Phone', str),
+                    ('Invoices', int), ('Revenue', float), ('Last invoice', str)]
+INVOICE_COLUMNS = [('ID', int), ('Date', str), ('Customer', str), ('Type', str), ('Total', float)]
+
+HISTORY_PAGE_SIZE = 200
+
+def run_export(export, db_name, filename, filters):
+    # export_pdf / export_zip on a connection of its own
+    db = Database(db_name)
+    try:
+        return export(db, filename, **filters)
+    finally:
+        db.close()
+
 class TableModel(QAbstractTableModel):
     def __init__(self, data, headers):
         super().__init__()
@@ -19,9 +46,54 @@ class TableModel(QAbstractTableModel):
             return str(self._data[index.row()][index.column()])
         return None
 
+    def row(self, row):
+        return self._data[row]
+
     def rowCount(self, index):
         return len(self._data)
 
+    # Row-level changes, so the view keeps its selection and scroll position
+    # and only repaints what changed. Rows are identified by their first
+    # column (the id) in row_updated / row_removed.
+
+    def set_rows(self, data):
+        self.beginResetModel()
+        self._data = list(data)
+        self.endResetModel()
+
+    def insert_row(self, row, data):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._data.insert(row, data)
+        self.endInsertRows()
+
+    def append_row(self, data):
+        self.insert_row(len(self._data), data)
+
+    def update_row(self, row, data):
+        self._data[row] = data
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._headers) - 1))
+
+    def remove_row(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._data[row]
+        self.endRemoveRows()
+
+    def find_row(self, row_id):
+        for row, data in enumerate(self._data):
+            if data[0] == row_id:
+                return row
+        return None
+
+    def row_updated(self, row_id, data):
+        row = self.find_row(row_id)
+        if row is not None:
+            self.update_row(row, data)
+
+    def row_removed(self, row_id):
+        row = self.find_row(row_id)
+        if row is not None:
+            self.remove_row(row)
+
     def columnCount(self, index):
         return len(self._headers)
 
@@ -30,19 +102,638 @@ class TableModel(QAbstractTableModel):
             return self._headers[section]
         return None
 
+class ColumnarTableModel(QAbstractTableModel):
+    # Table stored column by column: int and float columns in typed arrays,
+    # text as interned strings. EditRole / UserRole return the native value,
+    # so prices and ids compare as numbers; the display string of a cell is
+    # formatted once, on first paint, and cached. The first column is the
+    # row id. Columns are never reordered: _order maps view rows to stored
+    # rows, so sorting only builds a new _order (see ColumnSortProxyModel).
+    def __init__(self, rows, columns):
+        super().__init__()
+        self._headers = [header for header, _ in columns]
+        self._types = [kind for _, kind in columns]
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._load(rows)
+
+    def _load(self, rows):
+        self._values = []
+        for kind in self._types:
+            if kind is int:
+                self._values.append(array('q'))
+            elif kind is float:
+                self._values.append(array('d'))
+            else:
+                self._values.append([])
+        for data in rows:
+            for values, kind, value in zip(self._values, self._types, data):
+                values.append(self._native(kind, value))
+        count = len(self._values[0])
+        self._display = [[None] * count for _ in self._types]
+        self._order = array('q', range(count))
+
+    @staticmethod
+    def _native(kind, value):
+        if kind is str:
+            return sys.intern(str(value)) if value is not None else ''
+        return kind(value or 0)
+
+    def data(self, index, role=Qt.DisplayRole):
+        stored, column = self._order[index.row()], index.column()
+        if role == Qt.DisplayRole:
+            display = self._display[column]
+            text = display[stored]
+            if text is None:
+                value = self._values[column][stored]
+                text = display[stored] = f"{value:.2f}" if self._types[column] is float else str(value)
+            return text
+        if role in (Qt.EditRole, Qt.UserRole):
+            return self._values[column][stored]
+        return None
+
+    def row(self, row):
+        stored = self._order[row]
+        return tuple(values[stored] for values in self._values)
+
+    def rowCount(self, index=QModelIndex()):
+        return 0 if index.isValid() else len(self._order)
+
+    def columnCount(self, index=QModelIndex()):
+        return len(self._headers)
+
+    def headerData(self, section, orientation, role):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._headers[section]
+        return None
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # column -1 keeps the order the rows were given in (e.g. search rank)
+        self._sort_column, self._sort_order = column, order
+        if column < 0 or len(self._order) < 2:
+            return
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        selected = [self._order[index.row()] for index in persistent]
+        self._order = array('q', sorted(self._order, key=self._values[column].__getitem__,
+                                        reverse=order == Qt.DescendingOrder))
+        # Keep the selection on the same rows
+        self.changePersistentIndexList(
+            persistent,
+            [self.index(self._order.index(stored), index.column())
+             for stored, index in zip(selected, persistent)])
+        self.layoutChanged.emit()
+
+    # Row-level changes, as in TableModel
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._load(rows)
+        self.endResetModel()
+        self.sort(self._sort_column, self._sort_order)
+
+    def _stored_row(self, row_id):
+        try:
+            return self._values[0].index(row_id)
+        except ValueError:
+            return None
+
+    def find_row(self, row_id):
+        stored = self._stored_row(row_id)
+        return None if stored is None else self._order.index(stored)
+
+    def row_updated(self, row_id, data):
+        stored = self._stored_row(row_id)
+        if stored is None:
+            return
+        for values, display, kind, value in zip(self._values, self._display, self._types, data):
+            values[stored] = self._native(kind, value)
+            display[stored] = None
+        row = self._order.index(stored)
+        self.dataChanged.emit(self.index(row, 0), self.index(row, len(self._headers) - 1))
+
+    def row_removed(self, row_id):
+        stored = self._stored_row(row_id)
+        if stored is None:
+            return
+        row = self._order.index(stored)
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._order[row]
+        # The stored values stay, unreachable; ids are never 0
+        self._values[0][stored] = 0
+        self.endRemoveRows()
+
+class ColumnSortProxyModel(QSortFilterProxyModel):
+    # Filtering proxy in front of a ColumnarTableModel. QSortFilterProxyModel
+    # sorts by comparing cells pair by pair, each a call into Python (about
+    # 8s for 100k rows); the source model sorts a whole column in one go
+    # (about 50ms), so sorting is handed to it and the proxy only filters.
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sourceModel().sort(column, order)
+
+class DatabaseTableModel(QAbstractTableModel):
+    # Table model that pages rows in from the database as the view scrolls.
+    # fetch_page(after_id, limit) returns the rows following after_id ordered
+    # by id, fetch_row(row_id) returns a single row. Only the ids of fetched
+    # rows are kept for the whole table; full rows live in a bounded cache
+    # and are re-read a page at a time when they fall out of it.
+    # With an executor the queries run on its worker thread and rows show
+    # up when they arrive; without one they run inline.
+    def __init__(self, fetch_page, fetch_row, headers, page_size=200, cache_size=2000,
+                 executor=None):
+        super().__init__()
+        self._fetch_page = fetch_page
+        self._fetch_row = fetch_row
+        self._headers = headers
+        self._page_size = page_size
+        self._cache_size = cache_size
+        self._executor = executor
+        self._ids = array('q')
+        self._cache = OrderedDict()
+        self._stale = {}          # rows from before refresh(), shown until re-read
+        self._exhausted = False
+        self._fetching = False
+        self._loading = set()
+        self.fetchMore(QModelIndex())
+
+    def _call(self, func, args, callback):
+        if self._executor is None:
+            callback(func(*args))
+        else:
+            self._executor.submit(func, *args, on_result=callback)
+
+    def row_id(self, row):
+        return self._ids[row]
+
+    def row(self, row):
+        # The row's data if it is cached, else None; never queries
+        return self._cache.get(self._ids[row])
+
+    def load_row(self, row, callback):
+        # callback(data) with the row's data, read through fetch_row when it
+        # isn't cached (None if it was deleted by someone else meanwhile)
+        data = self.row(row)
+        if data is not None:
+            callback(data)
+            return
+
+        def loaded(data):
+            if data is not None:
+                self._remember(data)
+            callback(data)
+
+        self._call(self._fetch_row, (self._ids[row],), loaded)
+
+    def _remember(self, data):
+        self._stale.pop(data[0], None)
+        self._cache[data[0]] = data
+        self._cache.move_to_end(data[0])
+        while len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+
+    def _remember_page(self, rows):
+        # Last in first out, so the rows nearest the requested one survive
+        for data in reversed(rows):
+            self._remember(data)
+
+    def _load_window(self, row):
+        # Re-read the page-aligned window holding `row` (keyset on the id
+        # before it), so one repaint of missing rows is one query
+        start = row - row % self._page_size
+        if start in self._loading:
+            return
+        self._loading.add(start)
+        after_id = self._ids[start - 1] if start > 0 else None
+
+        def loaded(rows):
+            self._loading.discard(start)
+            self._remember_page(rows)
+            self._drop_missing(after_id, rows)
+            if not rows:
+                return
+            first = self._position(rows[0][0])
+            last = self._position(rows[-1][0])
+            if first is not None and last is not None:
+                self.dataChanged.emit(self.index(first, 0),
+                                      self.index(last, len(self._headers) - 1))
+
+        self._call(self._fetch_page, (after_id, self._page_size), loaded)
+
+    def _drop_missing(self, after_id, rows):
+        # Rows deleted elsewhere (another till, the CLI) are missing from a
+        # reloaded page: take them out of the table, or data() would keep
+        # asking for them. A short page reached the end of the table.
+        returned = {data[0] for data in rows}
+        first = bisect_right(self._ids, after_id) if after_id is not None else 0
+        if len(rows) == self._page_size:
+            end = bisect_right(self._ids, rows[-1][0])
+        else:
+            end = len(self._ids)
+        for position in reversed(range(first, end)):
+            row_id = self._ids[position]
+            if row_id not in returned:
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self._ids[position]
+                self._cache.pop(row_id, None)
+                self._stale.pop(row_id, None)
+                self.endRemoveRows()
+
+    def _position(self, row_id):
+        position = bisect_left(self._ids, row_id)
+        if position < len(self._ids) and self._ids[position] == row_id:
+            return position
+        return None
+
+    def data(self, index, role):
+        if role == Qt.DisplayRole:
+            row_id = self._ids[index.row()]
+            data = self._cache.get(row_id)
+            if data is None:
+                self._load_window(index.row())
+                data = self._cache.get(row_id)
+            if data is None:
+                data = self._stale.get(row_id)
+            else:
+                self._cache.move_to_end(row_id)
+            if data is None:
+                return None
+            value = data[index.column()]
+            if value is None:
+                return ""
+            return f"{value:.2f}" if isinstance(value, float) else str(value)
+        return None
+
+    def refresh(self):
+        # Re-read the visible rows, e.g. for values that changed behind the
+        # model's back. The cached rows are kept as stale and shown until
+        # their page is back, so nothing blanks out meanwhile. Rows added
+        # since the end was reached (e.g. customers saved with an invoice)
+        # are paged in after the last known id.
+        self._stale = self._cache
+        self._cache = OrderedDict()
+        if self._ids:
+            self.dataChanged.emit(self.index(0, 0),
+                                  self.index(len(self._ids) - 1, len(self._headers) - 1))
+        if self._exhausted:
+            self._exhausted = False
+            self.fetchMore(QModelIndex())
+
+    def rowCount(self, index):
+        return 0 if index.isValid() else len(self._ids)
+
+    def columnCount(self, index):
+        return len(self._headers)
+
+    def headerData(self, section, orientation, role):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._headers[section]
+        return None
+
+    def canFetchMore(self, index):
+        return not index.isValid() and not self._exhausted
+
+    def fetchMore(self, index):
+        if index.isValid() or self._exhausted or self._fetching:
+            return
+        self._fetching = True
+        after_id = self._ids[-1] if self._ids else None
+        self._call(self._fetch_page, (after_id, self._page_size), self._append_page)
+
+    def _append_page(self, rows):
+        self._fetching = False
+        if len(rows) < self._page_size:
+            self._exhausted = True
+        # Skip rows appended by row_inserted while the page was in flight
+        if self._ids:
+            rows = [data for data in rows if data[0] > self._ids[-1]]
+        if not rows:
+            return
+        first = len(self._ids)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        for data in rows:
+            self._ids.append(data[0])
+            self._remember(data)
+        self.endInsertRows()
+
+    # The methods below keep the model in sync after a CRUD operation by
+    # touching only the affected row instead of reloading the table. When
+    # the caller already has the row's values (data) they are used as is,
+    # otherwise the row is read back from the database.
+
+    def row_inserted(self, row_id, data=None):
+        # New ids are always the largest, so the row belongs at the end. If the
+        # end hasn't been fetched yet, fetchMore will pick it up.
+        if not self._exhausted or self._position(row_id) is not None:
+            return
+
+        def loaded(data):
+            if data is None or self._position(row_id) is not None:
+                return
+            position = len(self._ids)
+            self.beginInsertRows(QModelIndex(), position, position)
+            self._ids.append(row_id)
+            self._remember(data)
+            self.endInsertRows()
+
+        if data is not None:
+            loaded(data)
+        else:
+            self._call(self._fetch_row, (row_id,), loaded)
+
+    def row_updated(self, row_id, data=None):
+        if self._position(row_id) is None:
+            return
+
+        def loaded(data):
+            if data is None:
+                self.row_removed(row_id)
+                return
+            position = self._position(row_id)
+            if position is None:
+                return
+            self._remember(data)
+            self.dataChanged.emit(self.index(position, 0),
+                                  self.index(position, len(self._headers) - 1))
+
+        if data is not None:
+            loaded(data)
+        else:
+            self._call(self._fetch_row, (row_id,), loaded)
+
+    def row_removed(self, row_id):
+        position = self._position(row_id)
+        if position is None:
+            return
+        self.beginRemoveRows(QModelIndex(), position, position)
+        del self._ids[position]
+        self._cache.pop(row_id, None)
+        self._stale.pop(row_id, None)
+        self.endRemoveRows()
+
+class InvoiceHistoryModel(QAbstractTableModel):
+    # The History table: invoices matching the filters, sorted and paged
+    # in the database (Database.get_invoice_history) as the view scrolls.
+    # fetch_page(after=row, limit=n, **query) returns the rows following
+    # `after` (None for the first page). A change reloads the page
+    # it falls in: the pages before it are kept as they are, the ones after
+    # it are dropped and fetched again when scrolled to.
+    def __init__(self, fetch_page, headers, page_size=200, executor=None):
+        super().__init__()
+        self._fetch_page = fetch_page
+        self._headers = headers
+        self._page_size = page_size
+        self._executor = executor
+        self._query = {}
+        self._rows = []
+        self._exhausted = True
+        self._fetching = False
+        self._generation = 0    # bumped by every reload, so stale pages are dropped
+
+    def _call(self, callback, **kwargs):
+        generation = self._generation
+
+        def loaded(rows):
+            if generation == self._generation:
+                callback(rows)
+
+        args = dict(self._query, **kwargs)
+        if self._executor is None:
+            loaded(self._fetch_page(**args))
+        else:
+            self._executor.submit(self._fetch_page, on_result=loaded, **args)
+
+    def query(self):
+        return dict(self._query)
+
+    def reset(self, query, rows):
+        # New filters or sort order, with their first page already fetched
+        self.beginResetModel()
+        self._generation += 1
+        self._query = dict(query)
+        self._rows = list(rows)
+        self._exhausted = len(self._rows) < self._page_size
+        self._fetching = False
+        self.endResetModel()
+
+    def data(self, index, role):
+        if role == Qt.DisplayRole:
+            value = self._rows[index.row()][index.column()]
+            if value is None:
+                return ""
+            return f"{value:.2f}" if isinstance(value, float) else str(value)
+        return None
+
+    def row(self, row):
+        return self._rows[row]
+
+    def rowCount(self, index=QModelIndex()):
+        return 0 if index.isValid() else len(self._rows)
+
+    def columnCount(self, index=QModelIndex()):
+        return len(self._headers)
+
+    def headerData(self, section, orientation, role):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self._headers[section]
+        return None
+
+    def canFetchMore(self, index):
+        return not index.isValid() and not self._exhausted
+
+    def fetchMore(self, index):
+        if index.isValid() or self._exhausted or self._fetching:
+            return
+        self._fetching = True
+        self._call(self._append_page, after=self._rows[-1] if self._rows else None,
+                   limit=self._page_size)
+
+    def _append_page(self, rows):
+        self._fetching = False
+        self._exhausted = len(rows) < self._page_size
+        if rows:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            self._rows.extend(rows)
+            self.endInsertRows()
+
+    def find_row(self, row_id):
+        for row, data in enumerate(self._rows):
+            if data[0] == row_id:
+                return row
+        return None
+
+    def reload_from(self, row):
+        # Re-read the page holding `row` and drop everything after it
+        start = row - row % self._page_size
+        self._generation += 1
+        self._fetching = False
+
+        def loaded(rows):
+            if start < len(self._rows):
+                self.beginRemoveRows(QModelIndex(), start, len(self._rows) - 1)
+                del self._rows[start:]
+                self.endRemoveRows()
+            self._append_page(rows)
+
+        self._call(loaded, after=self._rows[start - 1] if start else None,
+                   limit=self._page_size)
+
+    # The methods below keep the model in sync after a CRUD operation
+
+    def row_inserted(self, row_id):
+        # Look the row up with the current filters: if it matches, reload the
+        # page it sorts into (unless that page hasn't been fetched yet)
+        def loaded(rows):
+            if not rows:
+                return
+            position = self._sort_position(rows[0])
+            if position < len(self._rows) or self._exhausted:
+                self.reload_from(position)
+
+        self._call(loaded, invoice_id=row_id, limit=1)
+
+    def _sort_position(self, data):
+        column = list(HISTORY_COLUMNS).index(self._query.get('sort', 'date'))
+        descending = self._query.get('descending', True)
+        key = (data[column], data[0])
+        for row, other in enumerate(self._rows):
+            other_key = (other[column], other[0])
+            if (other_key < key) if descending else (other_key > key):
+                return row
+        return len(self._rows)
+
+    def row_updated(self, row_id):
+        # Its sort position may have changed: reload from its page on
+        row = self.find_row(row_id)
+        if row is not None:
+            self.reload_from(row)
+
+    def row_removed(self, row_id):
+        row = self.find_row(row_id)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        self.endRemoveRows()
+
+class SearchTask(QRunnable):
+    def __init__(self, controller, generation, text):
+        super().__init__()
+        self.controller = controller
+        self.generation = generation
+        self.text = text
+
+    def run(self):
+        # Skip queries that went stale while waiting for the thread
+        if self.generation != self.controller.generation:
+            return
+        try:
+            rows = self.controller.search(self.text)
+        except sqlite3.OperationalError as e:
+            if str(e) == "interrupted":
+                return  # by a newer query
+            self.controller.error.emit(self.generation, self.text, e)
+            return
+        except Exception as e:
+            self.controller.error.emit(self.generation, self.text, e)
+            return
+        self.controller.finished.emit(self.generation, self.text, rows)
+
+class SearchController(QObject):
+    # Search-as-you-type off the GUI thread. Keystrokes are debounced, a new
+    # query interrupts the one still running on `database`, and only the
+    # results of the newest query are emitted through results_ready, and
+    # its errors (other than being interrupted) through failed.
+    # `search` should be a method of `database`, which must not be shared
+    # with other work since interrupting it aborts every running query.
+    finished = pyqtSignal(int, str, object)
+    error = pyqtSignal(int, str, object)
+    results_ready = pyqtSignal(str, object)
+    failed = pyqtSignal(str, object)
+
+    def __init__(self, database, search, delay=250, parent=None):
+        super().__init__(parent)
+        self.database = database
+        self.search = search
+        self.generation = 0
+        self._text = ""
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._start)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self.finished.connect(self._deliver)
+        self.error.connect(self._fail)
+
+    def text_changed(self, text):
+        self._text = text
+        self._timer.start()
+
+    def search_now(self, text):
+        self._timer.stop()
+        self._text = text
+        self._start()
+
+    def _start(self):
+        self.generation += 1
+        self.database.interrupt()
+        self._pool.start(SearchTask(self, self.generation, self._text))
+
+    def _deliver(self, generation, text, rows):
+        if generation == self.generation:
+            self.results_ready.emit(text, rows)
+
+    def _fail(self, generation, text, error):
+        if generation == self.generation:
+            self.failed.emit(text, error)
+
+    def shutdown(self):
+        self._timer.stop()
+        self.generation += 1
+        self.database.interrupt()
+        self._pool.waitForDone()
+        self.database.close()
+
 class MainWindow(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
         self.invoice_items = []
+        self.editing_invoice_id = None      # set while a stored invoice is in the form
+        self.editing_invoice_date = None    # and its stored date, which it prints with
         self.setup_create_invoice()
         
-        # Initialize database
+        # Initialize database and bring the schema up to date
         self.db = Database()
+        self.db.migrate()
+
+        # Database calls from the window run on this worker thread
+        self.db_executor = DatabaseExecutor(self)
+        self.db_executor.busy_changed.connect(self.set_busy)
+        self.db_executor.error.connect(self.show_error)
+        # Exports render for a long time: they get a thread (and a database
+        # connection) of their own so the window's queries don't queue behind
+        self.export_executor = DatabaseExecutor(self)
+        self.export_executor.busy_changed.connect(
+            lambda busy: self.statusBar().showMessage("Exporting invoices...") if busy
+            else self.statusBar().clearMessage())
+        self.busy_indicator = QtWidgets.QProgressBar()
+        self.busy_indicator.setRange(0, 0)
+        self.busy_indicator.setMaximumWidth(120)
+        self.busy_indicator.hide()
+        self.statusBar().addPermanentWidget(self.busy_indicator)
+
+        # Rendered PDFs, so reprinting an unchanged invoice is instant
+        self.pdf_cache = PDFCache(os.path.join(os.path.dirname(os.path.abspath(self.db.db_name)), "pdf_cache"))
+        # Files handed to the system PDF viewer, removed when the window closes
+        self.print_dir = tempfile.TemporaryDirectory(prefix="invoiciz_", ignore_cleanup_errors=True)
         
         # Connect menu buttons to page changes
         self.setup_menu_connections()
+        self.setup_connections()
+        self.setup_search()
         
         # Set up tables
         self.setup_tables()
@@ -50,6 +741,8 @@ class MainWindow(QtWidgets.QMainWindow):
         # Load initial data
         self.load_products()
         self.load_customers()
+        self.setup_history()
+        self.setup_dashboard()
 
     def setup_menu_connections(self):
         # Connect each menu button to its corresponding page
@@ -61,6 +754,18 @@ class MainWindow(QtWidgets.QMainWindow):
         
         # Set button styles for current page
         self.ui.stacked.currentChanged.connect(self.update_button_styles)
+        self.ui.stacked.currentChanged.connect(self.page_changed)
+
+    def page_changed(self, index):
+        # The dashboard is re-read whenever it is opened, and so are the
+        # customers' invoice rollups, which change with every saved invoice
+        if index == 0:
+            self.refresh_dashboard()
+        elif index == 4:
+            if isinstance(self.customers_model, DatabaseTableModel):
+                self.customers_model.refresh()
+            else:
+                self.search_customers()
 
     def update_button_styles(self, index):
         # Reset all button styles
@@ -118,14 +823,45 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ui.deleteCustomer_button.clicked.connect(self.delete_customer)
         self.ui.editCustomer_button.clicked.connect(self.edit_customer)
         
+        # Export button on the History page, next to edit/delete
+        self.exportInvoices_button = QtWidgets.QPushButton("Export Invoices", self.ui.history_page)
+        self.exportInvoices_button.setObjectName("exportInvoices_button")
+        self.exportInvoices_button.setMinimumSize(247, 29)
+        self.exportInvoices_button.setMaximumSize(247, 29)
+        self.exportInvoices_button.setStyleSheet(
+            self.ui.editInvoice_button.styleSheet().replace("editInvoice_button", "exportInvoices_button"))
+        self.ui.horizontalLayout_17.insertWidget(1, self.exportInvoices_button)
+        self.exportInvoices_button.clicked.connect(self.export_invoices)
+
+        # Double-clicking an invoice in History reprints it
+        self.ui.history_tableView.doubleClicked.connect(self.reprint_invoice)
+        self.ui.editInvoice_button.clicked.connect(self.edit_invoice)
+        self.ui.deleteInvoice_button.clicked.connect(self.delete_invoice)
+
         # Connect search buttons
         self.ui.historySearch_Button.clicked.connect(self.search_history)
         self.ui.productSearch_Button.clicked.connect(self.search_products)
         self.ui.customersSearch_Button.clicked.connect(self.search_customers)
-        
-        # Connect edit buttons
-        self.ui.editProduct_button.clicked.connect(self.edit_product)
-        self.ui.editCustomer_button.clicked.connect(self.edit_customer)
+
+    def setup_search(self):
+        # Each search box gets its own connection so that interrupting a
+        # stale query never aborts another page's search
+        products_db = Database(self.db.db_name)
+        customers_db = Database(self.db.db_name)
+        history_db = Database(self.db.db_name)
+        self.product_search = SearchController(products_db, products_db.search_products, parent=self)
+        self.customer_search = SearchController(customers_db, customers_db.search_customers, parent=self)
+        self.history_search = SearchController(history_db, self.fetch_history, parent=self)
+
+        self.ui.productSearch_input.textChanged.connect(self.product_search.text_changed)
+        self.ui.cutomersSearch_input.textChanged.connect(self.customer_search.text_changed)
+        self.ui.historySearch_input.textChanged.connect(self.history_search.text_changed)
+
+        self.product_search.results_ready.connect(self.show_product_results)
+        self.customer_search.results_ready.connect(self.show_customer_results)
+        self.history_search.results_ready.connect(self.show_history_results)
+        for search in (self.product_search, self.customer_search, self.history_search):
+            search.failed.connect(lambda text, e: self.show_error(f"Error searching for '{text}': {str(e)}"))
 
     def setup_tables(self):
         table_style = """
@@ -194,20 +930,85 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ui.history_tableView.setShowGrid(False)
 
     def load_products(self):
-        products = self.db.get_products()
-        self.products_model = TableModel(products, ['ID', 'Name', 'Description', 'Price'])
+        # Rows are paged in from the database as the table is scrolled
+        self.products_model = DatabaseTableModel(
+            self.db.get_products_page, self.db.get_product,
+            ['ID', 'Name', 'Description', 'Price'],
+            executor=self.db_executor
+        )
+        # Paged rows come in id order and can't be sorted client-side
+        self.ui.tableView_3.setSortingEnabled(False)
         self.ui.tableView_3.setModel(self.products_model)
 
     def load_customers(self):
-        customers = self.db.get_customers()
-        self.customers_model = TableModel(customers, ['ID', 'Name', 'Address', 'Phone'])
+        # Invoice count, revenue and last invoice date come from the
+        # trigger-maintained customer_stats, joined row by row
+        self.customers_model = DatabaseTableModel(
+            self.db.get_customer_rollups_page, self.db.get_customer_rollup,
+            [header for header, _ in CUSTOMER_COLUMNS],
+            executor=self.db_executor
+        )
+        self.ui.tableView_4.setSortingEnabled(False)
         self.ui.tableView_4.setModel(self.customers_model)
 
-    def get_selected_row_id(self, table_view):
+    def product_added(self, data):
+        # The paged model appends the new row; search results are ranked and
+        # the new row may not even match, so the search is re-run. Edits and
+        # deletes are applied to the one row by either model.
+        if isinstance(self.products_model, DatabaseTableModel):
+            self.products_model.row_inserted(data[0], data)
+        else:
+            self.search_products()
+
+    def customer_added(self, data):
+        if isinstance(self.customers_model, DatabaseTableModel):
+            self.customers_model.row_inserted(data[0], data)
+        else:
+            self.search_customers()
+
+    def set_busy(self, busy):
+        # Non-blocking: the window stays usable while the worker is busy
+        self.busy_indicator.setVisible(busy)
+        self.setCursor(Qt.BusyCursor if busy else Qt.ArrowCursor)
+
+    def selected_source_row(self, table_view):
+        # (model, row) of the current row, looked up through a sort/filter
+        # proxy; (None, None) without a selection
         index = table_view.currentIndex()
-        if index.isValid():
-            return int(table_view.model().data(table_view.model().index(index.row(), 0), Qt.DisplayRole))
-        return None
+        if not index.isValid():
+            return None, None
+        model = table_view.model()
+        if isinstance(model, QSortFilterProxyModel):
+            index = model.mapToSource(index)
+            model = model.sourceModel()
+        return model, index.row()
+
+    def with_selected_row(self, table_view, callback):
+        # callback(data) with the current row's data. A paged model may have
+        # to read it first, on the worker thread.
+        model, row = self.selected_source_row(table_view)
+        if model is None:
+            return
+        if isinstance(model, DatabaseTableModel):
+            model.load_row(row, lambda data: data is not None and callback(data))
+        else:
+            callback(model.row(row))
+
+    def get_selected_row_id(self, table_view):
+        model, row = self.selected_source_row(table_view)
+        if isinstance(model, DatabaseTableModel):
+            return model.row_id(row)
+        data = model.row(row) if model is not None else None
+        return int(data[0]) if data is not None else None
+
+    def show_sorted_results(self, table_view, model):
+        # Search results can be sorted by clicking a header; they start in
+        # rank order (no sort column)
+        proxy = ColumnSortProxyModel(table_view)
+        proxy.setSourceModel(model)
+        table_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        table_view.setModel(proxy)
+        table_view.setSortingEnabled(True)
 
     def show_add_product_dialog(self):
         dialog = ProductDialog()
@@ -215,8 +1016,11 @@ class MainWindow(QtWidgets.QMainWindow):
             name = dialog.name_input.text()
             description = dialog.desc_input.text()
             price = float(dialog.price_input.text())
-            self.db.add_product(name, description, price)
-            self.load_products()  # Refresh table
+            self.db_executor.submit(
+                self.db.add_product, name, description, price,
+                on_result=lambda product_id: self.product_added(
+                    (product_id, name, description, price))
+            )
 
     def show_add_customer_dialog(self):
         dialog = CustomerDialog()
@@ -224,8 +1028,11 @@ class MainWindow(QtWidgets.QMainWindow):
             name = dialog.name_input.text()
             address = dialog.address_input.text()
             phone = dialog.phone_input.text()
-            self.db.add_customer(name, address, phone)
-            self.load_customers()  # Refresh table
+            self.db_executor.submit(
+                self.db.add_customer, name, address, phone,
+                on_result=lambda customer_id: self.customer_added(
+                    (customer_id, name, address, phone, 0, 0.0, None))
+            )
 
     def add_product_to_invoice(self):
         # Add product to current invoice
@@ -235,40 +1042,45 @@ class MainWindow(QtWidgets.QMainWindow):
         if not self.validate_invoice():
             return
             
-        try:
-            # Save customer
-            customer_id = self.db.add_customer(
-                self.ui.companyName_input.text(),
-                self.ui.companyAddress_input.text(),
-                self.ui.companyPhone_input.text()
-            )
-            
-            # Save invoice with type
-            invoice_id = self.db.add_invoice(
-                None,  # owner_id
-                customer_id,
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                float(self.ui.totalPrice_input.text()),
-                self.ui.type_comboBox.currentText()
-            )
-            
-            # Save items
-            for item in self.invoice_items:
-                self.db.add_invoice_item(
-                    invoice_id,
-                    None,  # product_id
-                    item['quantity'],
-                    item['price']
-                )
-                
-            self.show_success("Invoice saved successfully!")
-            self.clear_invoice_form()
-            
-        except Exception as e:
-            self.show_error(f"Error saving invoice: {str(e)}")
+        # Customer, invoice and items are written in a single transaction
+        if self.editing_invoice_id is not None:
+            save = functools.partial(self.db.update_invoice_bundle, self.editing_invoice_id)
+            on_result = self.invoice_updated
+        else:
+            save = self.db.save_invoice_bundle
+            on_result = self.invoice_saved
+        self.db_executor.submit(
+            save,
+            {
+                'name': self.ui.companyName_input.text(),
+                'address': self.ui.companyAddress_input.text(),
+                'phone': self.ui.companyPhone_input.text()
+            },
+            {
+                'owner_id': None,
+                'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                'total': float(self.ui.totalPrice_input.text()),
+                'type': self.ui.type_comboBox.currentText(),
+                'discount': float(self.ui.discount_input.text() or 0)
+            },
+            list(self.invoice_items),
+            on_result=on_result,
+            on_error=lambda e: self.show_error(f"Error saving invoice: {str(e)}")
+        )
+
+    def invoice_saved(self, invoice_id):
+        self.show_success("Invoice saved successfully!")
+        self.clear_invoice_form()
+        self.history_model.row_inserted(invoice_id)
+
+    def invoice_updated(self, invoice_id):
+        self.show_success("Invoice updated successfully!")
+        self.clear_invoice_form()
+        self.history_model.row_updated(invoice_id)
 
     def print_invoice(self):
         invoice_data = {
+            'invoice_id': self.editing_invoice_id or '',
             'type': self.ui.type_comboBox.currentText(),
             'customer': {
                 'name': self.ui.companyName_input.text(),
@@ -280,12 +1092,57 @@ class MainWindow(QtWidgets.QMainWindow):
             'discount': float(self.ui.discount_input.text() or 0),
             'total': float(self.ui.totalPrice_input.text())
         }
+        if self.editing_invoice_date:
+            # A stored invoice keeps its own date; a new one prints today's
+            invoice_data['date'] = self.editing_invoice_date
         
-        pdf_generator = InvoicePDFGenerator(invoice_data)
-        filename = pdf_generator.generate()
-        
-        # Open PDF
-        os.startfile(filename)
+        pdf = self.pdf_cache.render(invoice_data)
+        self.open_pdf(pdf)
+
+    def open_pdf(self, pdf):
+        # The system viewer needs a file: hand it a uniquely named temporary one
+        with tempfile.NamedTemporaryFile(prefix="invoice_", suffix=".pdf", dir=self.print_dir.name,
+                                         delete=False) as f:
+            f.write(pdf)
+        os.startfile(f.name)
+
+    def reprint_invoice(self):
+        # Rendered from the stored invoice, on the database worker thread
+        invoice_id = self.get_selected_row_id(self.ui.history_tableView)
+        if invoice_id is not None:
+            self.db_executor.submit(
+                render_invoice, self.db, invoice_id, cache=self.pdf_cache,
+                on_result=self.open_pdf,
+                on_error=lambda e: self.show_error(f"Error printing invoice: {str(e)}")
+            )
+
+    def export_invoices(self):
+        # The customer list for the dialog's filter is read on the worker
+        self.db_executor.submit(
+            self.db.get_customer_choices,
+            on_result=self.show_export_dialog,
+            on_error=lambda e: self.show_error(f"Error loading customers: {str(e)}")
+        )
+
+    def show_export_dialog(self, customers):
+        dialog = ExportDialog(INVOICE_TYPES, customers)
+        if dialog.exec_() != QtWidgets.QDialog.Accepted:
+            return
+        if dialog.is_zip():
+            filename, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Export Invoices", "invoices.zip", "ZIP archives (*.zip)")
+            export = export_zip
+        else:
+            filename, _ = QtWidgets.QFileDialog.getSaveFileName(
+                self, "Export Invoices", "invoices.pdf", "PDF files (*.pdf)")
+            export = export_pdf
+        if not filename:
+            return
+        self.export_executor.submit(
+            run_export, export, self.db.db_name, filename, dialog.filters(),
+            on_result=lambda count: self.show_success(f"{count} invoice(s) exported to {filename}"),
+            on_error=lambda e: self.show_error(f"Error exporting invoices: {str(e)}")
+        )
 
     def cancel_invoice(self):
         # Cancel current invoice
@@ -294,16 +1151,13 @@ class MainWindow(QtWidgets.QMainWindow):
     def delete_product(self):
         product_id = self.get_selected_row_id(self.ui.tableView_3)
         if product_id is not None:
-            self.db.delete_product(product_id)
-            self.load_products()
+            self.db_executor.submit(
+                self.db.delete_product, product_id,
+                on_result=lambda _: self.products_model.row_removed(product_id)
+            )
 
     def edit_product(self):
-        selected_row = self.ui.tableView_3.currentIndex().row()
-        if selected_row >= 0:
-            product_data = self.products_model._data[selected_row]
-            result = self.show_edit_product_dialog(product_data)
-            if result:  # Only refresh if edit was successful
-                self.load_products()
+        self.with_selected_row(self.ui.tableView_3, self.show_edit_product_dialog)
 
     def show_edit_product_dialog(self, product_data):
         dialog = ProductDialog()
@@ -317,17 +1171,17 @@ class MainWindow(QtWidgets.QMainWindow):
             description = dialog.desc_input.text()
             price = float(dialog.price_input.text())
             
-            self.db.update_product(product_id, name, description, price)
+            # The row is refreshed once the update has been written
+            self.db_executor.submit(
+                self.db.update_product, product_id, name, description, price,
+                on_result=lambda _: self.products_model.row_updated(
+                    product_id, (product_id, name, description, price))
+            )
             return True
         return False
 
     def edit_customer(self):
-        selected_row = self.ui.tableView_4.currentIndex().row()
-        if selected_row >= 0:
-            customer_data = self.customers_model._data[selected_row]
-            result = self.show_edit_customer_dialog(customer_data)
-            if result:  # Only refresh if edit was successful
-                self.load_customers()
+        self.with_selected_row(self.ui.tableView_4, self.show_edit_customer_dialog)
 
     def show_edit_customer_dialog(self, customer_data):
         dialog = CustomerDialog()
@@ -341,27 +1195,234 @@ class MainWindow(QtWidgets.QMainWindow):
             address = dialog.address_input.text()
             phone = dialog.phone_input.text()
             
-            self.db.update_customer(customer_id, name, address, phone)
+            self.db_executor.submit(
+                self.db.update_customer, customer_id, name, address, phone,
+                on_result=lambda _: self.customers_model.row_updated(
+                    customer_id, (customer_id, name, address, phone) + tuple(customer_data[4:]))
+            )
             return True
         return False
 
     def delete_customer(self):
         customer_id = self.get_selected_row_id(self.ui.tableView_4)
         if customer_id is not None:
-            self.db.delete_customer(customer_id)
-            self.load_customers()
+            self.db_executor.submit(
+                self.db.delete_customer, customer_id,
+                on_result=lambda _: self.customers_model.row_removed(customer_id)
+            )
 
     def search_history(self):
-        # Search invoices history
-        pass
+        self.history_search.search_now(self.ui.historySearch_input.text())
 
     def search_products(self):
-        # Search products
-        pass
+        self.product_search.search_now(self.ui.productSearch_input.text())
 
     def search_customers(self):
-        # Search customers
-        pass
+        self.customer_search.search_now(self.ui.cutomersSearch_input.text())
+
+    def setup_history(self):
+        # Filtering, sorting and paging all happen in the database; the
+        # search box, type filter and header clicks just change the query
+        self.history_query = {'sort': 'date', 'descending': True, 'invoice_type': None}
+        self.history_model = InvoiceHistoryModel(
+            self.db.get_invoice_history, [header for header, _ in INVOICE_COLUMNS],
+            page_size=HISTORY_PAGE_SIZE, executor=self.db_executor
+        )
+        self.ui.history_tableView.setModel(self.history_model)
+
+        header = self.ui.history_tableView.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(list(HISTORY_COLUMNS).index('date'), Qt.DescendingOrder)
+        header.sortIndicatorChanged.connect(self.sort_history)
+
+        self.ui.historyType_comboBox.addItems(["All"] + INVOICE_TYPES)
+        self.ui.historyType_comboBox.currentIndexChanged.connect(self.filter_history)
+        self.search_history()
+
+    def setup_dashboard(self):
+        # The five cards at the top of the page
+        self.dashboard_values = {}
+        cards = [
+            (self.ui.frame_2, 'today', "Today", "#FFFFFF"),
+            (self.ui.frame_3, 'month', "This month", "#404040"),
+            (self.ui.frame_4, 'month_count', "Invoices this month", "#404040"),
+            (self.ui.frame_5, 'overall', "All-time revenue", "#404040"),
+            (self.ui.frame_7, 'customers', "Active customers", "#404040"),
+        ]
+        for frame, key, title, color in cards:
+            layout = QtWidgets.QVBoxLayout(frame)
+            layout.setContentsMargins(16, 12, 16, 12)
+            title_label = QtWidgets.QLabel(title)
+            title_label.setStyleSheet(f"color: {color}; font-family: Roboto; font-size: 12px; background: transparent;")
+            value_label = QtWidgets.QLabel("-")
+            value_label.setProperty("color", color)
+            self.set_card_font(value_label, 18)
+            layout.addWidget(title_label)
+            layout.addWidget(value_label)
+            self.dashboard_values[key] = value_label
+
+        # Tables under the cards
+        self.dashboard_tables = {}
+        container = QtWidgets.QWidget(self.ui.dashboard_page)
+        container.setGeometry(60, 170, 1070, 320)
+        row = QtWidgets.QHBoxLayout(container)
+        row.setContentsMargins(0, 0, 0, 0)
+        row.setSpacing(24)
+        tables = [
+            ('monthly', "Revenue per month", ['Month', 'Invoices', 'Revenue']),
+            ('types', "Invoices per type", ['Type', 'Invoices', 'Revenue']),
+            ('top_customers', "Top customers", ['Customer', 'Invoices', 'Revenue']),
+            ('top_products', "Top products", ['Product', 'Quantity', 'Revenue']),
+        ]
+        for key, title, headers in tables:
+            column = QtWidgets.QVBoxLayout()
+            label = QtWidgets.QLabel(title)
+            label.setStyleSheet("color: #000; font-family: Roboto; font-size: 12px; font-weight: 500;")
+            view = QTableView()
+            view.setModel(TableModel([], headers))
+            view.setStyleSheet("""
+                QTableView { border: 1px solid #EEEEEE; border-radius: 8px; font-size: 11px; }
+                QHeaderView::section { background-color: #FAFAFA; padding: 6px; border: none;
+                                       border-bottom: 1px solid #EEEEEE; color: #404040; font-size: 11px; }
+            """)
+            header = view.horizontalHeader()
+            header.setMinimumSectionSize(40)
+            header.setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
+            header.setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+            header.resizeSection(1, 64)
+            header.resizeSection(2, 90)
+            view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+            view.verticalHeader().setDefaultSectionSize(24)
+            view.verticalHeader().setVisible(False)
+            view.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+            view.setShowGrid(False)
+            column.addWidget(label)
+            column.addWidget(view)
+            row.addLayout(column)
+            self.dashboard_tables[key] = view.model()
+
+        self.refresh_dashboard()
+
+    def refresh_dashboard(self):
+        self.db_executor.submit(
+            self.db.get_dashboard, datetime.now().strftime("%Y-%m-%d"),
+            on_result=self.show_dashboard,
+            on_error=lambda e: self.show_error(f"Error loading dashboard: {str(e)}")
+        )
+
+    def set_card_font(self, label, size):
+        label.setStyleSheet(f"color: {label.property('color')}; font-family: Roboto; font-size: {size}px; "
+                            "font-weight: 500; background: transparent;")
+
+    def set_card_value(self, key, text):
+        # Large totals shrink to fit their card instead of being cut off
+        label = self.dashboard_values[key]
+        label.setText(text)
+        width = label.contentsRect().width()
+        size = 18
+        font = QtGui.QFont(label.font())
+        while width > 0 and size > 10:
+            font.setPixelSize(size)
+            if QtGui.QFontMetrics(font).horizontalAdvance(text) <= width:
+                break
+            size -= 1
+        self.set_card_font(label, size)
+
+    def show_dashboard(self, dashboard):
+        self.set_card_value('today', f"{dashboard['today'][1]:,.2f}")
+        self.set_card_value('month', f"{dashboard['month'][1]:,.2f}")
+        self.set_card_value('month_count', str(dashboard['month'][0]))
+        self.set_card_value('overall', f"{dashboard['overall'][1]:,.2f}")
+        self.set_card_value('customers', str(dashboard['customer_count']))
+        for key, model in self.dashboard_tables.items():
+            model.set_rows([name, count, f"{revenue:,.0f}"] for name, count, revenue in dashboard[key])
+
+    def fetch_history(self, text):
+        # Runs on the history search thread: the first page of the current
+        # query, returned with the query so later pages continue it
+        query = dict(self.history_query, text=text)
+        return query, self.history_search.database.get_invoice_history(limit=HISTORY_PAGE_SIZE, **query)
+
+    def sort_history(self, section, order):
+        self.history_query = dict(self.history_query, sort=list(HISTORY_COLUMNS)[section],
+                                  descending=order == Qt.DescendingOrder)
+        self.search_history()
+
+    def filter_history(self, index):
+        invoice_type = self.ui.historyType_comboBox.currentText() if index > 0 else None
+        self.history_query = dict(self.history_query, invoice_type=invoice_type)
+        self.search_history()
+
+    def show_history_results(self, text, result):
+        query, invoices = result
+        self.history_model.reset(query, invoices)
+
+    def edit_invoice(self):
+        # Load the stored invoice into the Create Invoice form; saving it
+        # then updates the invoice instead of adding a new one
+        invoice_id = self.get_selected_row_id(self.ui.history_tableView)
+        if invoice_id is not None:
+            self.db_executor.submit(
+                self.db.get_invoice_document, invoice_id,
+                on_result=self.load_invoice_into_form,
+                on_error=lambda e: self.show_error(f"Error loading invoice: {str(e)}")
+            )
+
+    def load_invoice_into_form(self, invoice_data):
+        if invoice_data is None:
+            self.show_error("This invoice no longer exists")
+            return
+        self.clear_invoice_form()
+        self.editing_invoice_id = invoice_data['invoice_id']
+        self.editing_invoice_date = invoice_data['date']
+        customer = invoice_data['customer']
+        self.ui.companyName_input.setText(customer['name'])
+        self.ui.companyAddress_input.setText(customer['address'])
+        self.ui.companyPhone_input.setText(customer['phone'])
+        self.ui.type_comboBox.setCurrentText(invoice_data['type'])
+        self.ui.discount_input.setText(f"{invoice_data['discount']:g}")
+        self.invoice_items.extend(invoice_data['items'])
+        self.refresh_invoice_table()
+        self.calculate_totals()
+        self.ui.saveInvoice_button.setText("Update Invoice")
+        self.ui.stacked.setCurrentIndex(1)
+
+    def delete_invoice(self):
+        invoice_id = self.get_selected_row_id(self.ui.history_tableView)
+        if invoice_id is None:
+            return
+        answer = QtWidgets.QMessageBox.question(
+            self, "Delete Invoice", f"Delete invoice {invoice_id} and all of its lines?")
+        if answer != QtWidgets.QMessageBox.Yes:
+            return
+        self.db_executor.submit(
+            self.db.delete_invoice_bundle, invoice_id,
+            on_result=lambda _: self.history_model.row_removed(invoice_id),
+            on_error=lambda e: self.show_error(f"Error deleting invoice: {str(e)}")
+        )
+
+    def show_product_results(self, text, products):
+        # An empty search box goes back to the full, paged table
+        if not text.strip():
+            self.load_products()
+            return
+        # Reuse the search model: the view keeps its header and scroll state
+        if isinstance(self.products_model, ColumnarTableModel):
+            self.products_model.set_rows(products)
+            return
+        self.products_model = ColumnarTableModel(products, PRODUCT_COLUMNS)
+        self.show_sorted_results(self.ui.tableView_3, self.products_model)
+
+    def show_customer_results(self, text, customers):
+        if not text.strip():
+            self.load_customers()
+            return
+        if isinstance(self.customers_model, ColumnarTableModel):
+            self.customers_model.set_rows(customers)
+            return
+        self.customers_model = ColumnarTableModel(customers, CUSTOMER_COLUMNS)
+        self.show_sorted_results(self.ui.tableView_4, self.customers_model)
 
     def setup_create_invoice(self):
         # Setup invoice table
@@ -386,8 +1447,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ui.discount_input.setValidator(QtGui.QDoubleValidator(0.00, 100.00, 2))
 
         # Setup invoice types
-        invoice_types = ["Bon de commande", "Bon d'achat", "Bon de vente", "Bon de livraison"]
-        self.ui.type_comboBox.addItems(invoice_types)
+        self.ui.type_comboBox.addItems(INVOICE_TYPES)
 
     def add_invoice_item(self):
         if not self.validate_item_inputs():
@@ -398,14 +1458,14 @@ class MainWindow(QtWidgets.QMainWindow):
         price = float(self.ui.productPrice_input.text())
         total = quantity * price
         
-        self.invoice_items.append({
+        item = {
             'name': name,
             'quantity': quantity,
             'price': price,
             'total': total
-        })
-        
-        self.refresh_invoice_table()
+        }
+        self.invoice_items.append(item)
+        self.invoice_model.append_row(self.invoice_item_row(item))
         self.calculate_totals()
         self.clear_item_inputs()
 
@@ -441,16 +1501,18 @@ class MainWindow(QtWidgets.QMainWindow):
         except ValueError:
             self.ui.totalPrice_input.setText(f"{net_total:.2f}")
 
-    def refresh_invoice_table(self):
-        data = [[
+    def invoice_item_row(self, item):
+        return [
             item['name'],
             str(item['quantity']),
             f"{item['price']:.2f}",
             f"{item['total']:.2f}"
-        ] for item in self.invoice_items]
-        
-        self.invoice_model = TableModel(data, ['Product', 'Quantity', 'Unit Price', 'Total'])
-        self.ui.create_tableView.setModel(self.invoice_model)
+        ]
+
+    def refresh_invoice_table(self):
+        # Replaces every row, e.g. after clearing the form; adding an item
+        # appends just its row
+        self.invoice_model.set_rows(self.invoice_item_row(item) for item in self.invoice_items)
 
     def clear_item_inputs(self):
         self.ui.productName_input.clear()
@@ -467,6 +1529,9 @@ class MainWindow(QtWidgets.QMainWindow):
         self.ui.totalPrice_input.clear()
         self.invoice_items.clear()
         self.refresh_invoice_table()
+        self.editing_invoice_id = None
+        self.editing_invoice_date = None
+        self.ui.saveInvoice_button.setText("Save Invoice")
 
     def validate_invoice(self):
         if not self.ui.companyName_input.text():
@@ -487,6 +1552,18 @@ class MainWindow(QtWidgets.QMainWindow):
             
         return True
 
+    def closeEvent(self, event):
+        # Stop background searches and release the long-lived connections
+        for controller in (self.product_search, self.customer_search, self.history_search):
+            controller.shutdown()
+        self.db_executor.shutdown()
+        # Waits for a running export, so no half-written file is left behind
+        self.export_executor.shutdown()
+        self.db.close()
+        # A viewer still showing a file may keep it (and the directory) locked
+        self.print_dir.cleanup()
+        super().closeEvent(event)
+
     def show_error(self, message):
         QtWidgets.QMessageBox.critical(self, "Error", message)
 
@@ -0,0 +1,94 @@
+# pdf_cache.py
+import hashlib
+import json
+import os
+import threading
+
+from invoice_pdf import InvoicePDFGenerator, TEMPLATE_VERSION
+from pdf_fonts import can_shape
+
+
+class PDFCache:
+    # Rendered PDFs on disk, keyed by a hash of the invoice data, the
+    # template version and the fonts and RTL shaping it renders with (a PDF
+    # drawn with the Helvetica fallback is not served once fonts are
+    # installed). An unchanged invoice is served from the cache; an
+    # edited one hashes differently, so its stale PDF is simply never hit
+    # again and ages out. The least recently used files are evicted once
+    # the cache grows past max_bytes.
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+
+    def key(self, invoice_data):
+        # The printed date is part of the content: invoices without a
+        # stored date get today's, as InvoicePDFGenerator prints it
+        generator = InvoicePDFGenerator(invoice_data)
+        data = dict(invoice_data, date=generator.invoice_date())
+        normalized = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+        fonts = ":".join(generator.fonts())
+        return hashlib.sha256(
+            f"{TEMPLATE_VERSION}:{fonts}:{can_shape()}:{normalized}".encode("utf-8")
+        ).hexdigest()
+
+    def render(self, invoice_data):
+        # PDF bytes for invoice_data, rendered only on a cache miss
+        key = self.key(invoice_data)
+        pdf = self.get(key)
+        if pdf is None:
+            pdf = InvoicePDFGenerator(invoice_data).to_bytes()
+            self.put(key, pdf)
+        return pdf
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                pdf = f.read()
+        except FileNotFoundError:
+            return None
+        # Mark as recently used for eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return pdf
+
+    def put(self, key, pdf):
+        path = self._path(key)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(pdf)
+        with self._lock:
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temporary, path)
+            self._size += len(pdf) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries():
+                os.remove(entry.path)
+            self._size = 0
+
+    def _evict(self):
+        # Drop least recently used files down to 80% of the limit, so a
+        # full cache doesn't rescan the directory on every put
+        entries = sorted(self._entries(), key=lambda entry: entry.stat().st_mtime)
+        for entry in entries:
+            if self._size <= self.max_bytes * 0.8:
+                break
+            size = entry.stat().st_size
+            os.remove(entry.path)
+            self._size -= size
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(".pdf")]
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pdf")
@@ -0,0 +1,103 @@
+# pdf_fonts.py
+import os
+
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+
+try:
+    import arabic_reshaper
+    from bidi.algorithm import get_display
+except ImportError:
+    arabic_reshaper = None
+
+# Unicode TrueType fonts, tried in order. Arabic and accented names need
+# glyphs the base-14 fonts don't have. INVOICIZ_FONT / INVOICIZ_BOLD_FONT
+# point at a specific pair.
+FONT_CANDIDATES = [
+    ("DejaVuSans", "DejaVuSans.ttf", "DejaVuSans-Bold.ttf"),
+    ("Arial", "arial.ttf", "arialbd.ttf"),
+    ("NotoSans", "NotoSans-Regular.ttf", "NotoSans-Bold.ttf"),
+]
+
+FONT_DIRECTORIES = [
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts"),
+    os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts"),
+    "/usr/share/fonts/truetype/dejavu",
+    "/usr/share/fonts/TTF",
+    "/usr/share/fonts/dejavu",
+    "/usr/share/fonts/truetype/noto",
+    "/Library/Fonts",
+]
+
+# Base-14 fonts: nothing to embed, but WinAnsi (Latin-1 plus a few) only
+BASE_FONTS = ("Helvetica", "Helvetica-Bold")
+
+_fonts = None
+
+
+def fonts_for(texts):
+    # Embedding a font subset costs several milliseconds and tens of KB per
+    # document, so invoices whose text the base-14 fonts can show (French
+    # included) keep using them
+    try:
+        for text in texts:
+            str(text).encode("cp1252")
+    except UnicodeEncodeError:
+        return get_fonts()
+    return BASE_FONTS
+
+
+def get_fonts():
+    # (regular, bold) font names for invoice PDFs. Parsing a TTF is slow, so
+    # it happens once per process, on first use: every later document just
+    # embeds the subset of glyphs it uses (ReportLab subsets TTFonts).
+    global _fonts
+    if _fonts is None:
+        _fonts = _register_fonts()
+    return _fonts
+
+
+def _register_fonts():
+    regular = os.environ.get("INVOICIZ_FONT")
+    bold = os.environ.get("INVOICIZ_BOLD_FONT")
+    if regular:
+        return _register("InvoicizSans", regular, bold or regular)
+
+    for name, regular, bold in FONT_CANDIDATES:
+        for directory in FONT_DIRECTORIES:
+            regular_path = os.path.join(directory, regular)
+            if os.path.exists(regular_path):
+                bold_path = os.path.join(directory, bold)
+                return _register(name, regular_path,
+                                 bold_path if os.path.exists(bold_path) else regular_path)
+    return BASE_FONTS
+
+
+def _register(name, regular_path, bold_path):
+    try:
+        pdfmetrics.registerFont(TTFont(name, regular_path))
+        pdfmetrics.registerFont(TTFont(f"{name}-Bold", bold_path))
+    except Exception:
+        return BASE_FONTS
+    return name, f"{name}-Bold"
+
+
+def can_shape():
+    # Whether shape() joins and reorders RTL text or leaves it as is
+    return arabic_reshaper is not None
+
+
+def has_rtl(text):
+    # Hebrew, Arabic and their presentation forms
+    return any("\u0590" <= ch <= "\u08ff" or "\ufb1d" <= ch <= "\ufeff" for ch in text)
+
+
+def shape(text):
+    # Text as it must be drawn: PDF strings are drawn left to right glyph by
+    # glyph, so Arabic needs its joined letter forms and visual order
+    # computed up front. Without arabic_reshaper/python-bidi installed the
+    # text is drawn unchanged.
+    text = str(text)
+    if arabic_reshaper is None or not has_rtl(text):
+        return text
+    return get_display(arabic_reshaper.reshape(text))
@@ -0,0 +1,71 @@
+# test_query_plans.py
+# The History and invoice-detail queries must be served by the migration
+# indexes, not by scanning invoices / invoice_items.
+#
+#   python -m pytest -q test_query_plans.py
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / "invoiciz.db"))
+    db.migrate()
+    customer = {'name': "Client", 'address': "Rue", 'phone': "0550"}
+    for day in range(1, 4):
+        db.save_invoice_bundle(
+            customer,
+            {'date': f"2024-01-0{day} 10:00:00", 'total': 10.0 * day, 'type': "Bon de vente"},
+            [{'product_id': None, 'name': "Câble", 'quantity': day, 'price': 10.0}],
+        )
+    yield db
+    db.close()
+
+
+def executed_plans(db, call):
+    # Run call(db) and return the query plan of every statement it executed
+    statements = []
+    with db.get_connection() as conn:
+        conn.set_trace_callback(statements.append)
+    try:
+        call(db)
+    finally:
+        with db.get_connection() as conn:
+            conn.set_trace_callback(None)
+    return [db.query_plan(sql) for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def assert_indexed(plans, index_prefix):
+    # No statement scans a whole table, and at least one uses the index
+    assert plans
+    for plan in plans:
+        assert not any(step in ("SCAN invoices", "SCAN invoice_items") for step in plan), plan
+    assert any(index_prefix in step for plan in plans for step in plan), plans
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {'invoice_type': "Bon de vente"},
+    {'invoice_type': "Bon de vente", 'sort': "total"},
+    {'customer_id': 1},
+    {'date_from': "2024-01-01", 'date_to': "2024-01-02"},
+    {'after': (3, "2024-01-03 10:00:00", "Client", "Bon de vente", 30.0)},
+])
+def test_history_uses_invoice_indexes(db, query):
+    plans = executed_plans(db, lambda db: db.get_invoice_history(**query))
+    assert_indexed(plans, "idx_invoices_")
+    # Pages come off the index in order (ties on the sort key may still be
+    # ordered by id afterwards: "RIGHT PART OF ORDER BY")
+    assert not any(step == "USE TEMP B-TREE FOR ORDER BY" for plan in plans for step in plan), plans
+
+
+def test_invoice_lookups_use_invoice_indexes(db):
+    assert_indexed(executed_plans(db, lambda db: db.get_invoices_by_type("Bon de vente")), "idx_invoices_")
+    assert_indexed(executed_plans(db, lambda db: db.get_customer_invoices(1)), "idx_invoices_")
+
+
+def test_invoice_detail_uses_item_index(db):
+    assert_indexed(executed_plans(db, lambda db: db.get_invoice_items(1)), "idx_invoice_items_invoice")
+    assert_indexed(executed_plans(db, lambda db: db.get_invoice_document(1)), "idx_invoice_items_invoice")
+    assert_indexed(executed_plans(db, lambda db: db.get_invoice_documents([1, 2])), "idx_invoice_items_invoice")